@@ -0,0 +1,81 @@
+"""
+Compare the installed JSON codecs on a people/memberships payload shaped
+like a parladata page.
+
+    python benchmarks/codec_benchmark.py --people 2000 --repeat 20
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from parladata_base_api.api.codec import CODECS
+
+
+def make_payload(people_count) -> dict:
+    people = [
+        {
+            "id": person_id,
+            "name": f"Oseba Številka {person_id}",
+            "parser_names": f"oseba {person_id}|številka {person_id}",
+            "gender": "female" if person_id % 2 else "male",
+            "date_of_birth": "1970-01-01",
+            "image": f"https://parladata.test/media/people/{person_id}.jpg",
+            "updated_at": "2024-03-10T12:00:00.000000+01:00",
+        }
+        for person_id in range(1, people_count + 1)
+    ]
+    memberships = [
+        {
+            "id": membership_id,
+            "member": membership_id % people_count + 1,
+            "organization": membership_id % 40 + 1,
+            "on_behalf_of": membership_id % 12 + 1,
+            "role": "member",
+            "mandate": 1,
+            "start_time": "2022-05-13T00:00:00",
+            "end_time": None,
+            "updated_at": "2024-03-10T12:00:00.000000+01:00",
+        }
+        for membership_id in range(1, people_count * 3 + 1)
+    ]
+    return {
+        "count": len(people) + len(memberships),
+        "next": None,
+        "previous": None,
+        "results": people + memberships,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--people", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = make_payload(args.people)
+    print(
+        f"{'codec':<10}{'decode ms':>12}{'encode ms':>12}{'pretty ms':>12}{'bytes':>12}"
+    )
+    for name, codec_class in CODECS.items():
+        codec = codec_class()
+        data = codec.dumps(payload)
+        decode = timeit.timeit(lambda: codec.loads(data), number=args.repeat)
+        encode = timeit.timeit(lambda: codec.dumps(payload), number=args.repeat)
+        pretty = timeit.timeit(
+            lambda: codec.dumps(payload, pretty=True), number=args.repeat
+        )
+        print(
+            f"{name:<10}"
+            f"{decode / args.repeat * 1000:>12.2f}"
+            f"{encode / args.repeat * 1000:>12.2f}"
+            f"{pretty / args.repeat * 1000:>12.2f}"
+            f"{len(data):>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare parser name lookups scanning all keys with lookups served by
+ParserNamesDict on a roster of people with aliases.
+
+    python benchmarks/parser_names_benchmark.py --people 1000 --aliases 5000
+"""
+
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from parladata_base_api.storages.utils import ParserNamesDict, Storage
+
+FIRST_NAMES = ["janez", "marija", "ana", "franc", "ivan", "maja", "peter", "nina"]
+SYLLABLES = ["ko", "va", "no", "hor", "kraj", "zu", "pan", "po", "toč", "mle", "lič"]
+SUFFIXES = ["nik", "ič", "ec", "ar", "šek"]
+
+
+def make_surname(rng) -> str:
+    syllables = rng.sample(SYLLABLES, rng.randint(2, 3))
+    return "".join(syllables) + rng.choice(SUFFIXES)
+
+
+def make_roster(people_count, alias_count, seed=1) -> list:
+    """Return `|` joined parser names keys with `alias_count` names in total."""
+    rng = random.Random(seed)
+    roster = []
+    for _ in range(people_count):
+        first, last = rng.choice(FIRST_NAMES), make_surname(rng)
+        roster.append([f"{first} {last}", f"{last} {first}"])
+    for index in range(alias_count - 2 * people_count):
+        aliases = roster[index % people_count]
+        first, last = aliases[0].split(" ")
+        aliases.append(rng.choice([f"{first[0]}. {last}", last, f"{last} {first[:3]}"]))
+    return ["|".join(dict.fromkeys(aliases)) for aliases in roster]
+
+
+def make_storage(keys, objects) -> Storage:
+    storage = Storage(SimpleNamespace(parladata_api=None))
+    storage.people = objects
+    for index, key in enumerate(keys):
+        storage.people[key] = index
+    return storage
+
+
+def to_genitive(name) -> str:
+    return " ".join(f"{word}a" for word in name.split(" "))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--people", type=int, default=1000)
+    parser.add_argument("--aliases", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+
+    keys = make_roster(args.people, args.aliases)
+    rng = random.Random(2)
+    names = [rng.choice(rng.choice(keys).split("|")) for _ in range(args.lookups)]
+    # speakers missing from the roster, which have to scan every name
+    names[::5] = [f"{rng.choice(FIRST_NAMES)} {make_surname(rng)}x" for _ in names[::5]]
+    genitives = [to_genitive(name) for name in names]
+
+    scan = make_storage(keys, {})
+    index = make_storage(keys, ParserNamesDict())
+    for name, genitive in zip(names, genitives):
+        assert scan.get_object_by_parsername(
+            "people", name
+        ) == index.get_object_by_parsername("people", name)
+        assert scan.get_object_by_parsername_compare_genitiv(
+            "people", genitive
+        ) == index.get_object_by_parsername_compare_genitiv("people", genitive)
+
+    print(f"{len(keys)} people, {args.aliases} aliases, {args.lookups} lookups")
+    print(f"{'lookup':<12}{'scan ms':>12}{'index ms':>12}")
+    for label, method, queries in (
+        ("exact", "get_object_by_parsername", names),
+        ("genitive", "get_object_by_parsername_compare_genitiv", genitives),
+    ):
+        timings = [
+            timeit.timeit(
+                lambda: [getattr(storage, method)("people", q) for q in queries],
+                number=1,
+            )
+            for storage in (scan, index)
+        ]
+        print(f"{label:<12}{timings[0] * 1000:>12.1f}{timings[1] * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,165 @@
-import json
+import gzip
 import logging
-from pathlib import Path
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urlencode
 
 from requests.auth import HTTPBasicAuth
 from requests.exceptions import RequestException
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from .codec import get_codec
+from .json_store import JsonStore
+from .query import match_query
+
 logger = logging.getLogger("logger")
 
 RETRY = 1
+PAGE_WORKERS = 4
+BULK_CHUNK_SIZE = 50
+BULK_CONCURRENCY = 4
+
+_END_OF_PAGES = object()
+
+
+def _record_retry(retry_state):
+    api, method, url = retry_state.args[:3]
+    if api.metrics is not None:
+        endpoint = api._endpoint_from_url(url) or "external"
+        api.metrics.record_retry(endpoint, method)
+
+
+def _read_ahead(pages, depth):
+    """
+    Consume `pages` on a background thread while the caller processes the
+    current page. At most `depth` pages wait in the queue.
+    """
+    pages_queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for page in pages:
+                if not put((page, None)):
+                    return
+        except Exception as error:
+            put((_END_OF_PAGES, error))
+        else:
+            put((_END_OF_PAGES, None))
+        finally:
+            if hasattr(pages, "close"):
+                pages.close()
+
+    threading.Thread(target=producer, daemon=True).start()
+    try:
+        while True:
+            page, error = pages_queue.get()
+            if page is _END_OF_PAGES:
+                if error:
+                    raise error
+                return
+            yield page
+    finally:
+        stop.set()
+
+
+class BulkResult(object):
+    """Outcome of Api.bulk_set."""
+
+    def __init__(self) -> None:
+        # created objects in input order
+        self.created = []
+        # (chunk index, chunk, error) for every chunk which was not created
+        self.failed = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    @property
+    def created_ids(self) -> list:
+        return [obj["id"] for obj in self.created]
+
+    def __repr__(self):
+        return f"<BulkResult created={len(self.created)} failed={len(self.failed)}>"
+
+
+class AdaptiveChunkSize(object):
+    """
+    Chunk size of bulk uploads which halves when a chunk took longer than
+    `target_time` or its body grew over `max_bytes`, and grows by a quarter
+    while chunks take less than half of `target_time`.
+    """
+
+    def __init__(
+        self,
+        size=BULK_CHUNK_SIZE,
+        min_size=1,
+        max_size=500,
+        target_time=2.0,
+        max_bytes=1024 * 1024,
+    ) -> None:
+        self.size = size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_time = target_time
+        self.max_bytes = max_bytes
+
+    def update(self, count, elapsed, body_size) -> None:
+        if elapsed > self.target_time or body_size > self.max_bytes:
+            size = self.size // 2
+        elif elapsed < self.target_time / 2:
+            size = self.size + max(1, self.size // 4)
+        else:
+            size = self.size
+        if body_size:
+            # keep the next body under max_bytes at the observed object size
+            size = min(size, int(self.max_bytes * count / body_size))
+        self.size = max(self.min_size, min(self.max_size, size))
 
 
 class Api(object):
-    def __init__(self, resquests_session, base_url=None, json_data_path=None):
+    def __init__(
+        self,
+        resquests_session,
+        base_url=None,
+        json_data_path=None,
+        page_workers=PAGE_WORKERS,
+        read_ahead=0,
+        response_cache=None,
+        metrics=None,
+        json_store=None,
+        codec=None,
+        gzip_min_size=None,
+    ):
         self.session = resquests_session
         self.base_url = base_url
         self.json_data_path = json_data_path
+        self.page_workers = page_workers
+        self.read_ahead = read_ahead
+        self.response_cache = response_cache
+        self.metrics = metrics
+        self.patch_buffer = None
+        self.codec = codec or get_codec()
+        self.gzip_min_size = gzip_min_size
+        if json_store is None and json_data_path:
+            json_store = JsonStore(json_data_path, codec=self.codec)
+        self.json_store = json_store
         endpoint = "base"
 
     @property
@@ -24,105 +168,218 @@ class Api(object):
 
     @property
     def _json_file_path(self):
-        return Path(self.json_data_path) / f"{self.endpoint}.json"
-
-    def _load_json_payload(self):
-        file_path = self._json_file_path
-        if not file_path.exists():
-            return {"count": 0, "next": None, "previous": None, "results": []}
-
-        with file_path.open("r", encoding="utf-8") as file:
-            payload = json.load(file)
-
-        if isinstance(payload, list):
-            payload = {
-                "count": len(payload),
-                "next": None,
-                "previous": None,
-                "results": payload,
-            }
-
-        payload.setdefault("count", 0)
-        payload.setdefault("next", None)
-        payload.setdefault("previous", None)
-        payload.setdefault("results", [])
-        return payload
-
-    def _save_json_payload(self, payload):
-        payload["count"] = len(payload.get("results", []))
-        payload["next"] = None
-        payload["previous"] = None
-
-        file_path = self._json_file_path
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        with file_path.open("w", encoding="utf-8") as file:
-            json.dump(payload, file, ensure_ascii=False, indent=4)
+        return self.json_store.file_path(self.endpoint)
 
-    @staticmethod
-    def _match_query(obj, query):
-        for key, value in query.items():
-            if obj.get(key) == value:
-                continue
+    def json_batch(self):
+        """Context manager deferring JSON storage writes until its exit."""
+        return self.json_store.batch()
+
+    _match_query = staticmethod(match_query)
 
-            if str(obj.get(key)) != str(value):
-                return False
-        return True
+    def _decode(self, response):
+        if not response.content:
+            # e.g. 204 No Content of a DELETE
+            return None
+        return self.codec.loads(response.content)
+
+    def _endpoint_from_url(self, url):
+        """Return the endpoint of an API url, None for foreign urls."""
+        if not self.base_url or not url.startswith(self.base_url):
+            return None
+        path = url[len(self.base_url) :].lstrip("/")
+        return path.split("?", 1)[0].split("/", 1)[0] or None
+
+    @staticmethod
+    def _conditional_headers(cached_headers, headers=None):
+        headers = dict(headers or {})
+        cached_headers = CaseInsensitiveDict(cached_headers)
+        if "ETag" in cached_headers:
+            headers["If-None-Match"] = cached_headers["ETag"]
+        if "Last-Modified" in cached_headers:
+            headers["If-Modified-Since"] = cached_headers["Last-Modified"]
+        return headers
 
     @staticmethod
-    def _find_object_index(results, object_id):
-        for index, obj in enumerate(results):
-            if str(obj.get("id")) == str(object_id):
-                return index
-        return None
+    def _cached_response(url, body, headers):
+        response = Response()
+        response.status_code = 200
+        response.url = url
+        response._content = body
+        response.headers = CaseInsensitiveDict(headers)
+        return response
+
+    def _encode_body(self, kwargs) -> dict:
+        """
+        Send a JSON body of at least `gzip_min_size` bytes gzip compressed,
+        smaller bodies are left to requests.
+        """
+        if self.gzip_min_size is None or kwargs.get("json") is None:
+            return kwargs
+        body = self.codec.dumps(kwargs["json"])
+        if len(body) < self.gzip_min_size:
+            return kwargs
+        kwargs = dict(kwargs)
+        del kwargs["json"]
+        kwargs["data"] = gzip.compress(body, compresslevel=6, mtime=0)
+        kwargs["headers"] = {
+            **(kwargs.get("headers") or {}),
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        }
+        return kwargs
+
+    def _record_metrics(self, endpoint, method, elapsed, **kwargs) -> None:
+        if self.metrics is not None:
+            self.metrics.record(endpoint or "external", method, elapsed, **kwargs)
 
     @retry(
         stop=stop_after_attempt(RETRY),
         wait=wait_exponential(multiplier=10, min=5, max=60),
+        before_sleep=_record_retry,
     )
     def _make_request(self, method, url, **kwargs):
         """Make an HTTP request with retry logic (GET, POST, PATCH, DELETE)."""
+        endpoint = self._endpoint_from_url(url)
+        cache = self.response_cache if endpoint else None
+        stale = None
+        if cache and method == "get":
+            cached = cache.get(url, endpoint)
+            if cached:
+                self._record_metrics(
+                    endpoint, method, 0.0, size=len(cached[0]), cached=True
+                )
+                return self._cached_response(url, *cached)
+
+            stale = cache.get_stale(url)
+            if stale:
+                kwargs["headers"] = self._conditional_headers(
+                    stale[1], kwargs.get("headers")
+                )
+
+        kwargs = self._encode_body(kwargs)
         func = getattr(self.session, method)
-        response = func(url, timeout=10, **kwargs)
+        started = time.perf_counter()
+        try:
+            response = func(url, timeout=10, **kwargs)
+        except Exception:
+            elapsed = time.perf_counter() - started
+            self._record_metrics(endpoint, method, elapsed, error=True)
+            raise
+        elapsed = time.perf_counter() - started
+
+        if response.status_code == 304 and stale:
+            self._record_metrics(endpoint, method, elapsed)
+            cache.mark_revalidated(url, len(stale[0]))
+            return self._cached_response(url, *stale)
+        self._record_metrics(
+            endpoint,
+            method,
+            elapsed,
+            size=len(response.content),
+            error=response.status_code > 299,
+        )
         if response.status_code > 299:
             raise RequestException(
-                f"API error {response.status_code}: {response.content}"
+                f"API error {response.status_code}: {response.content}",
+                response=response,
             )
+
+        if cache:
+            if method == "get":
+                cache.set(url, endpoint, response.content, dict(response.headers))
+            else:
+                cache.invalidate(endpoint)
         return response
 
-    def _get_data_from_pager_api_gen(self, url, limit=300):
+    @staticmethod
+    def _add_query_param(url, param):
         if "?" in url:
-            url = url + f"&limit={limit}"
-        else:
-            url = url + f"?limit={limit}"
+            return url + f"&{param}"
+        return url + f"?{param}"
+
+    def _get_data_from_pager_api_gen(self, url, limit=300):
+        url = self._add_query_param(url, f"limit={limit}")
         while url:
             response = self._make_request("get", url)
-            data = response.json()
+            data = self._decode(response)
             yield data["results"]
             url = data["next"]
 
-    def _get_objects(self, limit=300, *args, **kwargs):
+    def _get_data_from_pager_api_parallel_gen(self, url, limit=300):
+        """
+        Read `count` from the first page and fetch the remaining pages by
+        `limit`/`offset` on a thread pool. Pages are yielded in order and at
+        most `page_workers` of them are in flight at once.
+        """
+        url = self._add_query_param(url, f"limit={limit}")
+        response = self._make_request("get", url)
+        data = self._decode(response)
+        yield data["results"]
+
+        # the server may cap the page size below the requested limit
+        page_size = len(data["results"])
+        if not data["next"] or not page_size:
+            return
+
+        def get_page(offset):
+            page_url = self._add_query_param(url, f"offset={offset}")
+            return self._decode(self._make_request("get", page_url))["results"]
+
+        offsets = iter(range(page_size, data["count"], page_size))
+        with ThreadPoolExecutor(max_workers=self.page_workers) as executor:
+            pending = deque()
+            for offset in offsets:
+                pending.append(executor.submit(get_page, offset))
+                if len(pending) >= self.page_workers:
+                    break
+            while pending:
+                page = pending.popleft().result()
+                for offset in offsets:
+                    pending.append(executor.submit(get_page, offset))
+                    break
+                yield page
+
+    def _get_pages(self, url, limit=300):
+        if self.page_workers and self.page_workers > 1:
+            return self._get_data_from_pager_api_parallel_gen(url, limit)
+        return self._get_data_from_pager_api_gen(url, limit)
+
+    def _iter_objects(self, limit=300, *args, read_ahead=None, fields=None, **kwargs):
         if self._use_json_storage:
-            payload = self._load_json_payload()
-            results = payload.get("results", [])
-
-            if kwargs:
-                results = [obj for obj in results if self._match_query(obj, kwargs)]
-
-            return results[:limit]
+            for obj in self.json_store.filter(self.endpoint, kwargs):
+                if fields:
+                    obj = {field: obj[field] for field in fields if field in obj}
+                yield obj
+            return
         url = f"{self.base_url}/{self.endpoint}"
 
-        args = "&".join([f"{key}={value}" for key, value in kwargs.items()])
+        if fields:
+            kwargs["fields"] = ",".join(fields)
+        # values like `+02:00` offsets of timestamps have to be quoted
+        args = urlencode(
+            {
+                key: (
+                    ",".join(map(str, value))
+                    if isinstance(value, (list, tuple, set))
+                    else value
+                )
+                for key, value in kwargs.items()
+            },
+            safe=",",
+        )
         if args:
-            if "?" in url:
-                url = url + "&" + args
-            else:
-                url = url + "?" + args
+            url = self._add_query_param(url, args)
 
-        return [
-            obj
-            for page in self._get_data_from_pager_api_gen(url, limit)
-            for obj in page
-        ]
+        pages = self._get_pages(url, limit)
+        if read_ahead is None:
+            read_ahead = self.read_ahead
+        if read_ahead:
+            pages = _read_ahead(pages, read_ahead)
+        for page in pages:
+            yield from page
+
+    def _get_objects(self, limit=300, *args, **kwargs):
+        return list(self._iter_objects(limit, *args, **kwargs))
 
     def _get_object(self, object_id, custom_endpoint=None):
         if self._use_json_storage:
@@ -131,19 +388,17 @@ class Api(object):
                     "custom_endpoint is not supported in JSON storage mode for GET"
                 )
 
-            payload = self._load_json_payload()
-            results = payload.get("results", [])
-            index = self._find_object_index(results, object_id)
-            if index is None:
+            obj = self.json_store.get(self.endpoint, object_id)
+            if obj is None:
                 raise RequestException(f"Object with ID={object_id} does not exist")
 
-            return results[index]
+            return obj
 
         url = f"{self.base_url}/{self.endpoint}/{object_id}/" + (
             f"{custom_endpoint}/" if custom_endpoint else ""
         )
         response = self._make_request("get", url)
-        return response.json()
+        return self._decode(response)
 
     def _set_object(self, data, custom_endpoint=None):
         if self._use_json_storage:
@@ -152,24 +407,16 @@ class Api(object):
                     "custom_endpoint is not supported in JSON storage mode for POST"
                 )
 
-            payload = self._load_json_payload()
-            results = payload.get("results", [])
-
-            new_object = dict(data)
-            if "id" not in new_object:
-                max_id = max((obj.get("id", 0) for obj in results), default=0)
-                new_object["id"] = max_id + 1
-
-            results.append(new_object)
-            payload["results"] = results
-            self._save_json_payload(payload)
-            return new_object
+            # lists are created in bulk like the API does
+            items = data if isinstance(data, list) else [data]
+            new_objects = self.json_store.insert(self.endpoint, items)
+            return new_objects if isinstance(data, list) else new_objects[0]
 
         url = f"{self.base_url}/{self.endpoint}/" + (
             f"{custom_endpoint}/" if custom_endpoint else ""
         )
         response = self._make_request("post", url, json=data)
-        return response.json()
+        return self._decode(response)
 
     def _patch_object(self, object_id, data, custom_endpoint=None, files=None):
         if self._use_json_storage:
@@ -182,16 +429,10 @@ class Api(object):
                     "`files` is not supported in JSON storage mode"
                 )
 
-            payload = self._load_json_payload()
-            results = payload.get("results", [])
-            index = self._find_object_index(results, object_id)
-            if index is None:
+            updated_object = self.json_store.update(self.endpoint, object_id, data)
+            if updated_object is None:
                 raise RequestException(f"Object with ID={object_id} does not exist")
 
-            results[index].update(data)
-            updated_object = results[index]
-            payload["results"] = results
-            self._save_json_payload(payload)
             return updated_object
 
         url = f"{self.base_url}/{self.endpoint}/{object_id}/" + (
@@ -201,7 +442,7 @@ class Api(object):
             response = self._make_request("patch", url, files=files)
         else:
             response = self._make_request("patch", url, json=data)
-        return response.json()
+        return self._decode(response)
 
     def _delete_object(self, object_id, custom_endpoint=None):
         if self._use_json_storage:
@@ -210,25 +451,85 @@ class Api(object):
                     "custom_endpoint is not supported in JSON storage mode for DELETE"
                 )
 
-            payload = self._load_json_payload()
-            results = payload.get("results", [])
-            index = self._find_object_index(results, object_id)
-            if index is None:
+            deleted_object = self.json_store.delete(self.endpoint, object_id)
+            if deleted_object is None:
                 raise RequestException(f"Object with ID={object_id} does not exist")
 
-            deleted_object = results.pop(index)
-            payload["results"] = results
-            self._save_json_payload(payload)
             return deleted_object
 
         url = f"{self.base_url}/{self.endpoint}/{object_id}/" + (
             f"{custom_endpoint}/" if custom_endpoint else ""
         )
         response = self._make_request("delete", url)
-        return response.json()
+        return self._decode(response)
+
+    def get_all(self, limit=300, *args, fields=None, **kwargs) -> list:
+        """Return all objects, only with `fields` when they are given."""
+        return self._get_objects(limit, *args, fields=fields, **kwargs)
+
+    def iter_all(self, limit=300, *args, read_ahead=None, fields=None, **kwargs):
+        """
+        Yield objects page by page instead of building the whole list.
+        With `read_ahead` the next pages are fetched in the background, with
+        `fields` the server sends only those fields of every object.
+        """
+        return self._iter_objects(
+            limit, *args, read_ahead=read_ahead, fields=fields, **kwargs
+        )
 
-    def get_all(self, limit=300, *args, **kwargs) -> list:
-        return self._get_objects(limit, *args, **kwargs)
+    def bulk_set(
+        self,
+        objects,
+        chunk_size=BULK_CHUNK_SIZE,
+        concurrency=BULK_CONCURRENCY,
+        adaptive=False,
+    ) -> BulkResult:
+        """
+        POST objects from any iterable as list payloads of `chunk_size`, with
+        up to `concurrency` chunks in flight. Failed chunks are reported in the
+        result instead of raised. With `adaptive` the chunk size follows the
+        observed latency and body size, starting at `chunk_size`.
+        """
+        if self._use_json_storage:
+            # the JSON store writes one file per endpoint at a time anyway
+            concurrency = 1
+        chunker = AdaptiveChunkSize(chunk_size) if adaptive else None
+        result = BulkResult()
+        objects = iter(objects)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = deque()
+            index = 0
+            while chunk := list(
+                islice(objects, chunker.size if chunker else chunk_size)
+            ):
+                future = executor.submit(self._set_bulk_chunk, chunk, adaptive)
+                pending.append((index, chunk, future))
+                index += 1
+                if len(pending) >= concurrency:
+                    self._collect_bulk_chunk(result, *pending.popleft(), chunker)
+            while pending:
+                self._collect_bulk_chunk(result, *pending.popleft(), chunker)
+        return result
+
+    def _set_bulk_chunk(self, chunk, measure=False) -> tuple:
+        body_size = len(self.codec.dumps(chunk)) if measure else 0
+        started = time.perf_counter()
+        created = self._set_object(chunk)
+        return created, time.perf_counter() - started, body_size
+
+    def _collect_bulk_chunk(self, result, index, chunk, future, chunker=None) -> None:
+        try:
+            created, elapsed, body_size = future.result()
+        except Exception as error:
+            logger.warning(f"Bulk set of chunk {index} to {self.endpoint} failed")
+            result.failed.append((index, chunk, error))
+            return
+        if chunker is not None:
+            chunker.update(len(chunk), elapsed, body_size)
+        if isinstance(created, list):
+            result.created.extend(created)
+        else:
+            result.created.append(created)
 
     def get(self, person_id) -> dict:
         return self._get_object(person_id)
@@ -239,5 +540,15 @@ class Api(object):
     def patch(self, object_id, data, files=None) -> dict:
         return self._patch_object(object_id, data, files=files)
 
+    def deferred_patch(self, object_id, data) -> dict | None:
+        """
+        PATCH through the write-behind buffer when it is enabled. Buffered
+        patches return None and are sent on ParladataApi.flush().
+        """
+        if self.patch_buffer is not None:
+            self.patch_buffer.add(self, object_id, data)
+            return None
+        return self.patch(object_id, data)
+
     def delete(self, person_id) -> dict:
         return self._delete_object(person_id)
@@ -0,0 +1,144 @@
+import json
+import sqlite3
+import threading
+import time
+
+# Reference data which almost never changes, cached for a day.
+STATIC_ENDPOINT_TTLS = {
+    "procedure-phases": 24 * 60 * 60,
+    "legislation-status": 24 * 60 * 60,
+    "legislation-classifications": 24 * 60 * 60,
+    "areas": 24 * 60 * 60,
+}
+
+
+class ResponseCache(object):
+    """
+    SQLite-backed cache of GET response bodies.
+
+    Endpoints are served from the cache for `ttls[endpoint]` seconds
+    (`default_ttl` for others). With `revalidate` responses carrying an ETag
+    or Last-Modified header are kept after they expire, so they can be
+    reused when the server answers a conditional GET with 304. When the
+    stored bodies exceed `max_size` bytes the least recently used responses
+    are evicted.
+    """
+
+    def __init__(
+        self,
+        path,
+        ttls=None,
+        default_ttl=0,
+        max_size=50 * 1024 * 1024,
+        revalidate=True,
+    ):
+        self.path = str(path)
+        self.ttls = dict(STATIC_ENDPOINT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.revalidate = revalidate
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "bytes_saved": 0}
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    headers TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """)
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_endpoint ON responses (endpoint)"
+            )
+
+    def get_ttl(self, endpoint) -> int:
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, url, endpoint) -> tuple | None:
+        """Return (body, headers) of a fresh cached response or None."""
+        ttl = self.get_ttl(endpoint)
+        if ttl <= 0:
+            return None
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT body, headers FROM responses WHERE url = ? AND stored_at >= ?",
+                (url, now - ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url)
+            )
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += len(row[0])
+        return row[0], json.loads(row[1])
+
+    def get_stale(self, url) -> tuple | None:
+        """Return (body, headers) of a cached response regardless of its age."""
+        if not self.revalidate:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT body, headers FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def mark_revalidated(self, url, size) -> None:
+        """Record that the server confirmed the cached response is unchanged."""
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE url = ?",
+                (now, now, url),
+            )
+            self.stats["revalidated"] += 1
+            self.stats["bytes_saved"] += size
+
+    def set(self, url, endpoint, body, headers) -> None:
+        with self.lock:
+            self.stats["misses"] += 1
+        has_validators = any(
+            key.lower() in ("etag", "last-modified") for key in headers
+        )
+        if self.get_ttl(endpoint) <= 0 and not (self.revalidate and has_validators):
+            return
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, endpoint, body, json.dumps(headers), len(body), now, now),
+            )
+            self._evict()
+
+    def invalidate(self, endpoint) -> None:
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM responses WHERE endpoint = ?", (endpoint,)
+            )
+
+    def clear(self) -> None:
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM responses")
+
+    def _evict(self) -> None:
+        total_size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total_size <= self.max_size:
+            return
+        rows = self.connection.execute(
+            "SELECT url, size FROM responses ORDER BY accessed_at"
+        ).fetchall()
+        for url, size in rows:
+            if total_size <= self.max_size:
+                break
+            self.connection.execute("DELETE FROM responses WHERE url = ?", (url,))
+            total_size -= size
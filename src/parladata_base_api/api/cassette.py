@@ -0,0 +1,132 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+from requests.exceptions import RequestException
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+
+def _request_key(method, url, kwargs) -> tuple:
+    """Identify a request by method, url and body."""
+    if kwargs.get("json") is not None:
+        body = json.dumps(kwargs["json"], sort_keys=True)
+    elif kwargs.get("data") is not None:
+        data = kwargs["data"]
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        body = hashlib.sha1(data).hexdigest()
+    elif kwargs.get("files"):
+        body = "files:" + ",".join(sorted(kwargs["files"]))
+    else:
+        body = None
+    return method, url, body
+
+
+class RecordingSession(object):
+    """
+    Wraps a requests.Session and appends every request with its response to
+    a JSON Lines cassette file, which ReplaySession can serve later.
+    """
+
+    def __init__(self, session, path) -> None:
+        self.session = session
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def request(self, method, url, **kwargs):
+        started = time.perf_counter()
+        response = getattr(self.session, method)(url, **kwargs)
+        elapsed = time.perf_counter() - started
+
+        method, url, body = _request_key(method, url, kwargs)
+        interaction = {
+            "method": method,
+            "url": url,
+            "body": body,
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "content": base64.b64encode(response.content).decode("ascii"),
+            "elapsed": elapsed,
+        }
+        with self.lock, self.path.open("a", encoding="utf-8") as file:
+            file.write(json.dumps(interaction) + "\n")
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("get", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("post", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("patch", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("delete", url, **kwargs)
+
+
+class ReplaySession(object):
+    """
+    Serves responses recorded by RecordingSession without network access.
+
+    Repeated identical requests get the recorded responses in order, the last
+    one is reused when they run out. With `latency_scale` every response is
+    delayed by its recorded latency multiplied by the scale.
+    """
+
+    def __init__(self, path, latency_scale=None) -> None:
+        self.latency_scale = latency_scale
+        self.interactions = defaultdict(deque)
+        self.lock = threading.Lock()
+        with Path(path).open("r", encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                interaction = json.loads(line)
+                key = (
+                    interaction["method"],
+                    interaction["url"],
+                    interaction["body"],
+                )
+                self.interactions[key].append(interaction)
+
+    def request(self, method, url, **kwargs):
+        key = _request_key(method, url, kwargs)
+        with self.lock:
+            recorded = self.interactions.get(key)
+            if not recorded:
+                raise RequestException(
+                    f"No recorded response for {method.upper()} {url}"
+                )
+            interaction = recorded.popleft() if len(recorded) > 1 else recorded[0]
+
+        if self.latency_scale:
+            time.sleep(interaction["elapsed"] * self.latency_scale)
+
+        response = Response()
+        response.status_code = interaction["status_code"]
+        response.url = url
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        response._content = base64.b64decode(interaction["content"])
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("get", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("post", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("patch", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("delete", url, **kwargs)
@@ -0,0 +1,77 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class StdlibCodec(object):
+    name = "json"
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(obj, pretty=False) -> bytes:
+        if pretty:
+            return json.dumps(obj, ensure_ascii=False, indent=4).encode("utf-8")
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+
+
+class OrjsonCodec(object):
+    name = "orjson"
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+    @staticmethod
+    def dumps(obj, pretty=False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+
+
+class MsgspecCodec(object):
+    name = "msgspec"
+
+    def __init__(self) -> None:
+        self.encoder = msgspec.json.Encoder()
+        self.decoder = msgspec.json.Decoder()
+
+    def loads(self, data):
+        return self.decoder.decode(data)
+
+    def dumps(self, obj, pretty=False) -> bytes:
+        data = self.encoder.encode(obj)
+        if pretty:
+            return msgspec.json.format(data, indent=4)
+        return data
+
+
+# available codecs, fastest first
+CODECS = {}
+if orjson is not None:
+    CODECS["orjson"] = OrjsonCodec
+if msgspec is not None:
+    CODECS["msgspec"] = MsgspecCodec
+CODECS["json"] = StdlibCodec
+
+
+def get_codec(name=None):
+    """
+    Return the codec called `name`, or the fastest installed one. Codecs
+    decode from bytes and encode to compact bytes, `pretty=True` indents.
+    """
+    if name is None:
+        name = next(iter(CODECS))
+    if name not in CODECS:
+        raise ValueError(f"JSON codec {name} is not available")
+    return CODECS[name]()
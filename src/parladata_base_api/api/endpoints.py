@@ -1,9 +1,17 @@
 from datetime import datetime
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
-from .api import Api
+from .api import PAGE_WORKERS, Api
+from .cache import ResponseCache
+from .cassette import RecordingSession, ReplaySession
+from .codec import get_codec
+from .json_store import GzipJsonStore, JsonLinesStore, JsonStore
+from .metrics import RequestMetrics
+from .sqlite_store import SqliteStore
+from .write_buffer import PatchBuffer
 
 
 class PeopleApi(Api):
@@ -11,7 +19,7 @@ class PeopleApi(Api):
 
     def add_person_parser_name(self, person_id, parser_name) -> dict:
         return self._set_object(
-            f"people/{person_id}/add_parser_name", {"parser_name": parser_name}
+            {"parser_name": parser_name}, custom_endpoint=f"{person_id}/add_parser_name"
         )
 
     def upload_image(self, person_id, image_url) -> dict:
@@ -35,7 +43,7 @@ class SessionsApi(Api):
         date_str = datetime.now().date().strftime("%Y-%m-%d")
         url = f"{self.base_url}/speeches/count/?session={id}&valid_on={date_str}"
         response = self._make_request("get", url)
-        data = response.json()
+        data = self._decode(response)
         if "count" in data.keys():
             return data["count"]
         else:
@@ -128,61 +136,149 @@ class MandatesApi(Api):
     endpoint = "mandates"
 
 
+# local data stores used with json_data_path, by `json_format`
+JSON_STORES = {
+    "json": JsonStore,
+    "json.gz": GzipJsonStore,
+    "jsonl": JsonLinesStore,
+    "sqlite": SqliteStore,
+}
+
+
 class ParladataApi(object):
     def __init__(
-        self, api_url=None, api_user=None, api_password=None, json_data_path=None
+        self,
+        api_url=None,
+        api_user=None,
+        api_password=None,
+        json_data_path=None,
+        page_workers=PAGE_WORKERS,
+        cache_path=None,
+        json_format="json",
+        json_codec=None,
+        json_debug=False,
+        gzip_min_size=None,
     ):
         self.base_url = api_url
         self.json_data_path = json_data_path
         self.session = requests.Session()
+        self.response_cache = ResponseCache(cache_path) if cache_path else None
+        self.patch_buffer = None
+        self.metrics = None
+        self.json_store = None
+        self.codec = get_codec(json_codec)
+        if json_data_path:
+            self.json_store = JSON_STORES[json_format](
+                json_data_path, codec=self.codec, pretty=json_debug
+            )
 
         if self.base_url and api_user is not None and api_password is not None:
             self.session.auth = HTTPBasicAuth(api_user, api_password)
 
-        self.sessions = SessionsApi(self.session, self.base_url, self.json_data_path)
-        self.people = PeopleApi(self.session, self.base_url, self.json_data_path)
-        self.organizations = OrganizationsApi(
-            self.session, self.base_url, self.json_data_path
-        )
-        self.votes = VotesApi(self.session, self.base_url, self.json_data_path)
-        self.motions = MotionsApi(self.session, self.base_url, self.json_data_path)
-        self.agenda_items = AgendaItemsApi(
-            self.session, self.base_url, self.json_data_path
-        )
-        self.questions = QuestionsApi(self.session, self.base_url, self.json_data_path)
-        self.answers = AnswersApi(self.session, self.base_url, self.json_data_path)
-        self.public_person_questions = PublicPersonQuestionsApi(
-            self.session, self.base_url, self.json_data_path
-        )
-        self.public_person_answers = PublicPersonAnswersApi(
-            self.session, self.base_url, self.json_data_path
-        )
-        self.legislation = LegislationApi(
-            self.session, self.base_url, self.json_data_path
-        )
+        # make room in the connection pool for concurrent page requests
+        adapter = HTTPAdapter(pool_maxsize=max(page_workers or 1, 10))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        api_args = (self.session, self.base_url, self.json_data_path)
+        api_kwargs = {
+            "page_workers": page_workers,
+            "response_cache": self.response_cache,
+            "json_store": self.json_store,
+            "codec": self.codec,
+            "gzip_min_size": gzip_min_size,
+        }
+
+        self.sessions = SessionsApi(*api_args, **api_kwargs)
+        self.people = PeopleApi(*api_args, **api_kwargs)
+        self.organizations = OrganizationsApi(*api_args, **api_kwargs)
+        self.votes = VotesApi(*api_args, **api_kwargs)
+        self.motions = MotionsApi(*api_args, **api_kwargs)
+        self.agenda_items = AgendaItemsApi(*api_args, **api_kwargs)
+        self.questions = QuestionsApi(*api_args, **api_kwargs)
+        self.answers = AnswersApi(*api_args, **api_kwargs)
+        self.public_person_questions = PublicPersonQuestionsApi(*api_args, **api_kwargs)
+        self.public_person_answers = PublicPersonAnswersApi(*api_args, **api_kwargs)
+        self.legislation = LegislationApi(*api_args, **api_kwargs)
         self.legislation_classifications = LegislationClassificationsApi(
-            self.session, self.base_url, self.json_data_path
-        )
-        self.procedures = ProceduresApi(
-            self.session, self.base_url, self.json_data_path
-        )
-        self.procedure_phases = ProcedurePhasesApi(
-            self.session, self.base_url, self.json_data_path
+            *api_args, **api_kwargs
         )
+        self.procedures = ProceduresApi(*api_args, **api_kwargs)
+        self.procedure_phases = ProcedurePhasesApi(*api_args, **api_kwargs)
         self.legislation_consideration = LegislationConsiderationApi(
-            self.session, self.base_url, self.json_data_path
-        )
-        self.legislation_statuses = LegislationStatusesApi(
-            self.session, self.base_url, self.json_data_path
-        )
-        self.person_memberships = PersonMembershipsApi(
-            self.session, self.base_url, self.json_data_path
+            *api_args, **api_kwargs
         )
+        self.legislation_statuses = LegislationStatusesApi(*api_args, **api_kwargs)
+        self.person_memberships = PersonMembershipsApi(*api_args, **api_kwargs)
         self.organizations_memberships = OrganizationsMembershipsApi(
-            self.session, self.base_url, self.json_data_path
+            *api_args, **api_kwargs
+        )
+        self.areas = AreasApi(*api_args, **api_kwargs)
+        self.speeches = SpeechesApi(*api_args, **api_kwargs)
+        self.ballots = BallotsApi(*api_args, **api_kwargs)
+        self.links = LinksApi(*api_args, **api_kwargs)
+        self.mandates = MandatesApi(*api_args, **api_kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def json_batch(self):
+        """
+        Context manager deferring JSON storage writes. Every changed endpoint
+        file is written once, atomically, when the block exits.
+        """
+        return self.json_store.batch()
+
+    def endpoint_apis(self) -> list:
+        return [value for value in vars(self).values() if isinstance(value, Api)]
+
+    def use_session(self, session) -> None:
+        """Send requests of every endpoint through `session`."""
+        self.session = session
+        for api in self.endpoint_apis():
+            api.session = session
+
+    def record(self, cassette_path) -> RecordingSession:
+        """Write every request and response to a cassette file."""
+        self.use_session(RecordingSession(self.session, cassette_path))
+        return self.session
+
+    def replay(self, cassette_path, latency_scale=None) -> ReplaySession:
+        """
+        Serve responses from a recorded cassette instead of the network,
+        optionally delayed by the recorded latency times `latency_scale`.
+        """
+        self.use_session(ReplaySession(cassette_path, latency_scale=latency_scale))
+        return self.session
+
+    def attach_metrics(self, metrics=None) -> RequestMetrics:
+        """Record all requests of every endpoint into `metrics`."""
+        self.metrics = metrics if metrics is not None else RequestMetrics()
+        for api in self.endpoint_apis():
+            api.metrics = self.metrics
+        return self.metrics
+
+    def enable_write_behind(
+        self, max_pending=100, workers=4, max_attempts=3
+    ) -> PatchBuffer:
+        """
+        Buffer PATCHes sent with `deferred_patch` and merge the ones to the same
+        object. They are sent on flush(), when `max_pending` objects wait, or at
+        the exit of `with parladata_api:`. Failed patches are sent again up to
+        `max_attempts` times.
+        """
+        self.flush()
+        self.patch_buffer = PatchBuffer(
+            max_pending=max_pending, workers=workers, max_attempts=max_attempts
         )
-        self.areas = AreasApi(self.session, self.base_url, self.json_data_path)
-        self.speeches = SpeechesApi(self.session, self.base_url, self.json_data_path)
-        self.ballots = BallotsApi(self.session, self.base_url, self.json_data_path)
-        self.links = LinksApi(self.session, self.base_url, self.json_data_path)
-        self.mandates = MandatesApi(self.session, self.base_url, self.json_data_path)
+        for api in self.endpoint_apis():
+            api.patch_buffer = self.patch_buffer
+        return self.patch_buffer
+
+    def flush(self) -> list:
+        if self.patch_buffer is None:
+            return []
+        return self.patch_buffer.flush()
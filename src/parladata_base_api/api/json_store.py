@@ -0,0 +1,374 @@
+import gzip
+import logging
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from .codec import get_codec
+from .query import compile_query, equality_filters
+
+logger = logging.getLogger("logger")
+
+
+class EndpointData(object):
+    """
+    Parsed payload of one endpoint with an `id -> row` index and lazily
+    built `value -> rows` indexes of the fields it is filtered on.
+    """
+
+    def __init__(self, payload, signature) -> None:
+        self.payload = payload
+        self.signature = signature
+        self.index = {}
+        self.field_indexes = {}
+        self.max_id = 0
+        for row in payload["results"]:
+            self.add_to_index(row)
+
+    def add_to_index(self, row) -> None:
+        object_id = row.get("id")
+        self.index.setdefault(str(object_id), row)
+        if isinstance(object_id, int) and not isinstance(object_id, bool):
+            self.max_id = max(self.max_id, object_id)
+        self.field_indexes = {}
+
+    def lookup(self, field, value) -> list:
+        if field not in self.field_indexes:
+            field_index = {}
+            for row in self.payload["results"]:
+                field_index.setdefault(str(row.get(field)), []).append(row)
+            self.field_indexes[field] = field_index
+        return self.field_indexes[field].get(str(value), [])
+
+
+def copy_row(row) -> dict:
+    """
+    Copy of a stored row, so callers can not change the store in place.
+    Values of rows are scalars, lists of ids or flat dicts.
+    """
+    return {
+        key: value.copy() if isinstance(value, (list, dict)) else value
+        for key, value in row.items()
+    }
+
+
+class JsonStore(object):
+    """
+    Local data store keeping the parsed `<endpoint>.json` files in memory.
+
+    Rows are looked up through an id index and new ids come from a running
+    max id. A file is parsed again only when it was changed on disk by
+    someone else. Inside `batch()` writes are deferred and every changed
+    endpoint is written once at the end. Files are written compact unless
+    `pretty` is set for debugging. Reads and writes return copies of the
+    stored rows.
+    """
+
+    def __init__(self, json_data_path, codec=None, pretty=False) -> None:
+        self.json_data_path = Path(json_data_path)
+        self.codec = codec or get_codec()
+        self.pretty = pretty
+        self.endpoints = {}
+        self.dirty = set()
+        self.batch_depth = 0
+        self.lock = threading.RLock()
+
+    def file_path(self, endpoint) -> Path:
+        return self.json_data_path / f"{endpoint}.json"
+
+    def _file_signature(self, endpoint) -> tuple | None:
+        file_path = self.file_path(endpoint)
+        if not file_path.exists():
+            return None
+        stat = file_path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_payload(self, endpoint) -> dict:
+        file_path = self.file_path(endpoint)
+        if not file_path.exists():
+            return {"count": 0, "next": None, "previous": None, "results": []}
+
+        payload = self.codec.loads(self._read_file(file_path))
+
+        if isinstance(payload, list):
+            payload = {
+                "count": len(payload),
+                "next": None,
+                "previous": None,
+                "results": payload,
+            }
+
+        payload.setdefault("count", 0)
+        payload.setdefault("next", None)
+        payload.setdefault("previous", None)
+        payload.setdefault("results", [])
+        return payload
+
+    def _write_payload(self, endpoint, payload) -> None:
+        payload["count"] = len(payload.get("results", []))
+        payload["next"] = None
+        payload["previous"] = None
+
+        self._write_file(
+            self.file_path(endpoint), self.codec.dumps(payload, pretty=self.pretty)
+        )
+
+    def _read_file(self, file_path) -> bytes:
+        with file_path.open("rb") as file:
+            return file.read()
+
+    def _write_file(self, file_path, data) -> None:
+        self._atomic_write(file_path, lambda file: file.write(data))
+
+    @staticmethod
+    def _atomic_write(file_path, write) -> None:
+        """
+        Write to a temporary file and rename it over `file_path`, so readers
+        never see a partially written file.
+        """
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as file:
+                write(file)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _get_data(self, endpoint) -> EndpointData:
+        signature = self._file_signature(endpoint)
+        data = self.endpoints.get(endpoint, None)
+        if endpoint in self.dirty:
+            # unflushed changes in memory win over the file
+            return data
+        if data is None or data.signature != signature:
+            data = EndpointData(self._read_payload(endpoint), signature)
+            self.endpoints[endpoint] = data
+        return data
+
+    def _save(self, endpoint, data) -> None:
+        if self.batch_depth:
+            self.dirty.add(endpoint)
+            return
+        self._write_payload(endpoint, data.payload)
+        data.signature = self._file_signature(endpoint)
+
+    def _commit(self, endpoint, data, records) -> None:
+        """
+        Persist a change of `endpoint`. `records` describe the change as log
+        records, this store rewrites the whole file instead.
+        """
+        self._save(endpoint, data)
+
+    @contextmanager
+    def batch(self):
+        """Defer writes and write each changed endpoint once on exit."""
+        with self.lock:
+            self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.batch_depth -= 1
+                if not self.batch_depth:
+                    self.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            for endpoint in sorted(dirty):
+                self._save(endpoint, self.endpoints[endpoint])
+
+    def all(self, endpoint) -> list:
+        with self.lock:
+            return [
+                copy_row(row) for row in self._get_data(endpoint).payload["results"]
+            ]
+
+    def get(self, endpoint, object_id) -> dict | None:
+        with self.lock:
+            row = self._get_data(endpoint).index.get(str(object_id), None)
+            return copy_row(row) if row is not None else None
+
+    def filter(self, endpoint, query):
+        """Iterate over objects of `endpoint` matching all `query` filters."""
+        with self.lock:
+            data = self._get_data(endpoint)
+            predicate = compile_query(query, self.filter)
+            equalities = equality_filters(query)
+            if equalities:
+                rows = list(data.lookup(*next(iter(equalities.items()))))
+            else:
+                rows = list(data.payload["results"])
+        for row in rows:
+            if predicate(row):
+                yield copy_row(row)
+
+    def insert(self, endpoint, objects) -> list:
+        """Append objects, giving the ones without an id the next free id."""
+        with self.lock:
+            data = self._get_data(endpoint)
+            new_objects = []
+            for obj in objects:
+                new_object = copy_row(obj)
+                if "id" not in new_object:
+                    new_object["id"] = data.max_id + 1
+                data.payload["results"].append(new_object)
+                data.add_to_index(new_object)
+                new_objects.append(new_object)
+            records = [{"op": "set", "row": row} for row in new_objects]
+            self._commit(endpoint, data, records)
+            return [copy_row(row) for row in new_objects]
+
+    def update(self, endpoint, object_id, values) -> dict | None:
+        with self.lock:
+            data = self._get_data(endpoint)
+            row = data.index.get(str(object_id), None)
+            if row is None:
+                return None
+            row.update(copy_row(values))
+            data.field_indexes = {}
+            if str(row.get("id")) != str(object_id):
+                del data.index[str(object_id)]
+                data.add_to_index(row)
+            records = [{"op": "patch", "id": object_id, "values": values}]
+            self._commit(endpoint, data, records)
+            return copy_row(row)
+
+    def delete(self, endpoint, object_id) -> dict | None:
+        with self.lock:
+            data = self._get_data(endpoint)
+            row = data.index.pop(str(object_id), None)
+            if row is None:
+                return None
+            data.field_indexes = {}
+            results = data.payload["results"]
+            del results[next(i for i, obj in enumerate(results) if obj is row)]
+            self._commit(endpoint, data, [{"op": "delete", "id": object_id}])
+            return row
+
+
+class GzipJsonStore(JsonStore):
+    """JsonStore keeping every endpoint as a gzip compressed `<endpoint>.json.gz`."""
+
+    def __init__(self, json_data_path, codec=None, pretty=False, level=6) -> None:
+        super().__init__(json_data_path, codec=codec, pretty=pretty)
+        self.level = level
+
+    def file_path(self, endpoint) -> Path:
+        return self.json_data_path / f"{endpoint}.json.gz"
+
+    def _read_file(self, file_path) -> bytes:
+        return gzip.decompress(super()._read_file(file_path))
+
+    def _write_file(self, file_path, data) -> None:
+        super()._write_file(
+            file_path, gzip.compress(data, compresslevel=self.level, mtime=0)
+        )
+
+
+class JsonLinesStore(JsonStore):
+    """
+    Local data store keeping every endpoint as an append-only
+    `<endpoint>.jsonl` log of `set`, `patch` and `delete` records.
+
+    Writes append one line per record. Reads replay the log, a torn last line
+    left by an interrupted run is cut off. `compact()` rewrites a log as one
+    `set` record per object.
+    """
+
+    def __init__(self, json_data_path, codec=None, pretty=False) -> None:
+        super().__init__(json_data_path, codec=codec, pretty=pretty)
+        self.pending_records = defaultdict(list)
+
+    def file_path(self, endpoint) -> Path:
+        return self.json_data_path / f"{endpoint}.jsonl"
+
+    def _read_payload(self, endpoint) -> dict:
+        rows = {}
+        file_path = self.file_path(endpoint)
+        if file_path.exists():
+            with file_path.open("rb") as file:
+                content = file.read()
+            if content and not content.endswith(b"\n"):
+                logger.warning(f"Dropping incomplete last record of {file_path}")
+                content = content[: content.rfind(b"\n") + 1]
+                with file_path.open("r+b") as file:
+                    file.truncate(len(content))
+            for line in content.splitlines():
+                if line.strip():
+                    self._replay(rows, self.codec.loads(line))
+        results = list(rows.values())
+        return {
+            "count": len(results),
+            "next": None,
+            "previous": None,
+            "results": results,
+        }
+
+    @staticmethod
+    def _replay(rows, record) -> None:
+        if record["op"] == "set":
+            rows[str(record["row"].get("id"))] = record["row"]
+        elif record["op"] == "patch":
+            key = str(record["id"])
+            row = rows.get(key, None)
+            if row is None:
+                return
+            row.update(record["values"])
+            new_key = str(row.get("id"))
+            if new_key != key:
+                # keep the row in place like JsonStore.update does
+                items = [(new_key if k == key else k, v) for k, v in rows.items()]
+                rows.clear()
+                rows.update(items)
+        elif record["op"] == "delete":
+            rows.pop(str(record["id"]), None)
+
+    def _append(self, endpoint, records) -> None:
+        file_path = self.file_path(endpoint)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        lines = b"".join(self.codec.dumps(record) + b"\n" for record in records)
+        with file_path.open("ab") as file:
+            file.write(lines)
+
+    def _commit(self, endpoint, data, records) -> None:
+        if self.batch_depth:
+            self.dirty.add(endpoint)
+            self.pending_records[endpoint].extend(records)
+            return
+        self._append(endpoint, records)
+        data.signature = self._file_signature(endpoint)
+
+    def flush(self) -> None:
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            for endpoint in sorted(dirty):
+                self._append(endpoint, self.pending_records.pop(endpoint, []))
+                self.endpoints[endpoint].signature = self._file_signature(endpoint)
+
+    def compact(self, endpoint=None) -> None:
+        """Rewrite the log of `endpoint` (or of every endpoint) as a snapshot."""
+        with self.lock:
+            self.flush()
+            if endpoint is None:
+                endpoints = [path.stem for path in self.json_data_path.glob("*.jsonl")]
+            else:
+                endpoints = [endpoint]
+            for name in endpoints:
+                data = self._get_data(name)
+                self._atomic_write(
+                    self.file_path(name),
+                    lambda file: file.writelines(
+                        self.codec.dumps({"op": "set", "row": row}) + b"\n"
+                        for row in data.payload["results"]
+                    ),
+                )
+                data.signature = self._file_signature(name)
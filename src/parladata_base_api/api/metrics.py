@@ -0,0 +1,89 @@
+import json
+import threading
+from bisect import bisect_left
+
+# upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics(object):
+    """
+    Collects per endpoint and method request counts, latency histograms,
+    response sizes, retries and errors of all requests made by the Api.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def _get_stats(self, endpoint, method) -> dict:
+        key = (endpoint, method)
+        if key not in self.stats:
+            self.stats[key] = {
+                "count": 0,
+                "cached": 0,
+                "errors": 0,
+                "retries": 0,
+                "bytes": 0,
+                "total_time": 0.0,
+                "max_time": 0.0,
+                "histogram": [0] * (len(self.buckets) + 1),
+            }
+        return self.stats[key]
+
+    def record(self, endpoint, method, elapsed, size=0, error=False, cached=False):
+        with self.lock:
+            stats = self._get_stats(endpoint, method)
+            stats["count"] += 1
+            stats["bytes"] += size
+            if cached:
+                stats["cached"] += 1
+                return
+            if error:
+                stats["errors"] += 1
+            stats["total_time"] += elapsed
+            stats["max_time"] = max(stats["max_time"], elapsed)
+            stats["histogram"][bisect_left(self.buckets, elapsed)] += 1
+
+    def record_retry(self, endpoint, method) -> None:
+        with self.lock:
+            self._get_stats(endpoint, method)["retries"] += 1
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stats = {}
+
+    def report(self, as_json=False) -> dict | str:
+        """Return collected metrics per endpoint and method, with totals."""
+        labels = [f"<={bucket}s" for bucket in self.buckets]
+        labels.append(f">{self.buckets[-1]}s")
+        endpoints = {}
+        totals = {"count": 0, "errors": 0, "retries": 0, "bytes": 0, "time": 0.0}
+        with self.lock:
+            for (endpoint, method), stats in sorted(self.stats.items()):
+                requests = stats["count"] - stats["cached"]
+                endpoints.setdefault(endpoint, {})[method] = {
+                    "count": stats["count"],
+                    "cached": stats["cached"],
+                    "errors": stats["errors"],
+                    "retries": stats["retries"],
+                    "bytes": stats["bytes"],
+                    "total_time": round(stats["total_time"], 6),
+                    "mean_time": (
+                        round(stats["total_time"] / requests, 6) if requests else 0.0
+                    ),
+                    "max_time": round(stats["max_time"], 6),
+                    "latency_histogram": dict(zip(labels, stats["histogram"])),
+                }
+                totals["count"] += stats["count"]
+                totals["errors"] += stats["errors"]
+                totals["retries"] += stats["retries"]
+                totals["bytes"] += stats["bytes"]
+                totals["time"] += stats["total_time"]
+        totals["time"] = round(totals["time"], 6)
+
+        report = {"endpoints": endpoints, "totals": totals}
+        if as_json:
+            return json.dumps(report, indent=2)
+        return report
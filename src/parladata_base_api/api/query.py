@@ -0,0 +1,146 @@
+LOOKUPS = ("in", "gte", "lte")
+
+# foreign key fields and the endpoints they point to, for `__` traversal
+RELATED_ENDPOINTS = {
+    "agenda_item": "agenda-items",
+    "area": "areas",
+    "legislation": "legislation",
+    "mandate": "mandates",
+    "member": "people",
+    "motion": "motions",
+    "organization": "organizations",
+    "person": "people",
+    "personvoter": "people",
+    "procedure_phase": "procedure-phases",
+    "question": "questions",
+    "session": "sessions",
+    "speaker": "people",
+    "vote": "votes",
+}
+
+
+def _compile_valid_on(value):
+    """Objects valid on the date `value`, like the `valid_on` API filter."""
+    date = str(value)[:10]
+
+    def predicate(obj):
+        valid_from, valid_to = obj.get("valid_from"), obj.get("valid_to")
+        if valid_from and str(valid_from)[:10] > date:
+            return False
+        return not valid_to or str(valid_to)[:10] >= date
+
+    return predicate
+
+
+# filters of the API which are not a lookup on a single field
+FILTERS = {"valid_on": _compile_valid_on}
+
+
+def _equals(obj_value, value) -> bool:
+    return obj_value == value or str(obj_value) == str(value)
+
+
+def _order_key(obj_value, value) -> tuple:
+    """Make two values comparable, numerically if both are numbers."""
+    try:
+        return float(obj_value), float(value)
+    except (TypeError, ValueError):
+        return str(obj_value), str(value)
+
+
+def _compile_lookup(field, lookup, value):
+    if lookup == "in":
+        if isinstance(value, str):
+            value = value.split(",")
+        values = {str(item) for item in value}
+        return lambda obj: str(obj.get(field)) in values
+    if lookup in ("gte", "lte"):
+
+        def compare(obj):
+            obj_value = obj.get(field)
+            if obj_value is None:
+                return False
+            left, right = _order_key(obj_value, value)
+            return left >= right if lookup == "gte" else left <= right
+
+        return compare
+    return lambda obj: _equals(obj.get(field), value)
+
+
+def _compile_related(field, subquery, related):
+    """
+    Filter on fields of a related object. The related endpoint is queried
+    once and the ids of its matching objects form the join index.
+    """
+    ids = None
+    if related is not None and field in RELATED_ENDPOINTS:
+        ids = {str(obj["id"]) for obj in related(RELATED_ENDPOINTS[field], subquery)}
+    # embedded objects are rare, their predicate is compiled on first use
+    # so the related endpoints are not queried again
+    match_related = None
+
+    def predicate(obj):
+        nonlocal match_related
+        obj_value = obj.get(field)
+        if isinstance(obj_value, dict):
+            if match_related is None:
+                match_related = compile_query(subquery, related)
+            return match_related(obj_value)
+        return ids is not None and str(obj_value) in ids
+
+    return predicate
+
+
+def split_key(key) -> tuple:
+    """Split a filter key like `motion__session__in` into (path, lookup)."""
+    path = key.split("__")
+    if len(path) > 1 and path[-1] in LOOKUPS:
+        return path[:-1], path[-1]
+    return path, None
+
+
+def compile_query(query, related=None):
+    """
+    Compile Django style filters into one predicate over objects.
+
+    Supported are equality (with the string fallback of the REST filters),
+    `__in`, `__gte`, `__lte`, `__` traversal into related objects and the
+    FILTERS of the API.
+    `related(endpoint, query)` has to return the objects of `endpoint`
+    matching `query`, it is needed to traverse ids of related objects.
+    """
+    predicates = []
+    subqueries = {}
+    for key, value in query.items():
+        if key in FILTERS:
+            predicates.append(FILTERS[key](value))
+            continue
+        path, lookup = split_key(key)
+        if len(path) > 1:
+            subkey = "__".join(path[1:] + ([lookup] if lookup else []))
+            subqueries.setdefault(path[0], {})[subkey] = value
+        else:
+            predicates.append(_compile_lookup(path[0], lookup, value))
+    for field, subquery in subqueries.items():
+        predicates.append(_compile_related(field, subquery, related))
+
+    if not predicates:
+        return lambda obj: True
+    if len(predicates) == 1:
+        return predicates[0]
+    return lambda obj: all(predicate(obj) for predicate in predicates)
+
+
+def match_query(obj, query) -> bool:
+    return compile_query(query)(obj)
+
+
+def equality_filters(query) -> dict:
+    """Plain `field=value` filters of `query`, usable for index lookups."""
+    return {
+        key: value
+        for key, value in query.items()
+        if "__" not in key
+        and key not in FILTERS
+        and not isinstance(value, (list, tuple, set, dict))
+    }
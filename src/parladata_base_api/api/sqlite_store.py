@@ -0,0 +1,196 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from .codec import get_codec
+from .query import compile_query
+
+# fields with an expression index, filters on them are index lookups
+INDEXED_FIELDS = ("mandate", "session", "member", "organization", "gov_id")
+
+
+class SqliteStore(object):
+    """
+    Local data store keeping objects of all endpoints as JSON documents in a
+    SQLite database, with the same surface as JsonStore.
+
+    Equality filters on INDEXED_FIELDS are resolved by expression indexes,
+    the remaining filters are checked on the narrowed rows.
+    """
+
+    def __init__(
+        self, json_data_path, file_name="parladata.sqlite3", codec=None, pretty=False
+    ) -> None:
+        self.json_data_path = Path(json_data_path)
+        self.codec = codec or get_codec()
+        self.pretty = pretty
+        self.json_data_path.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.json_data_path / file_name
+        self.batch_depth = 0
+        self.max_ids = {}
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS objects (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    endpoint TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    UNIQUE (endpoint, id)
+                )
+                """)
+            for field in INDEXED_FIELDS:
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS objects_{field} "
+                    f"ON objects (endpoint, json_extract(data, '$.{field}'))"
+                )
+
+    def _dumps(self, obj) -> str:
+        # json_extract() needs the documents stored as text
+        return self.codec.dumps(obj, pretty=self.pretty).decode("utf-8")
+
+    def file_path(self, endpoint) -> Path:
+        return self.db_path
+
+    def _commit(self) -> None:
+        if not self.batch_depth:
+            self.connection.commit()
+
+    @contextmanager
+    def batch(self):
+        """Run all writes in one transaction, committed on exit."""
+        with self.lock:
+            self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.batch_depth -= 1
+                self._commit()
+
+    def flush(self) -> None:
+        with self.lock:
+            self.connection.commit()
+
+    def _get_max_id(self, endpoint) -> int:
+        if endpoint not in self.max_ids:
+            # only integer ids count, like in JsonStore
+            row = self.connection.execute(
+                "SELECT MAX(json_extract(data, '$.id')) FROM objects "
+                "WHERE endpoint = ? AND json_type(data, '$.id') = 'integer'",
+                (endpoint,),
+            ).fetchone()
+            self.max_ids[endpoint] = row[0] or 0
+        return self.max_ids[endpoint]
+
+    @staticmethod
+    def _index_values(value) -> list | None:
+        """Stored values matching `value` like equality filters do, if indexable."""
+        if isinstance(value, bool) or value is None:
+            return None
+        if isinstance(value, int):
+            return [value, str(value)]
+        if isinstance(value, str):
+            if value.lstrip("-").isdigit():
+                return [value, int(value)]
+            return [value]
+        return None
+
+    def all(self, endpoint) -> list:
+        return list(self.filter(endpoint, {}))
+
+    def filter(self, endpoint, query):
+        """Iterate over objects of `endpoint` matching all `query` filters."""
+        sql = "SELECT data FROM objects WHERE endpoint = ?"
+        params = [endpoint]
+        for key, value in query.items():
+            values = self._index_values(value) if key in INDEXED_FIELDS else None
+            if values is None:
+                continue
+            placeholders = ", ".join("?" for _ in values)
+            sql += f" AND json_extract(data, '$.{key}') IN ({placeholders})"
+            params.extend(values)
+        sql += " ORDER BY seq"
+
+        with self.lock:
+            predicate = compile_query(query, self.filter)
+            rows = self.connection.execute(sql, params).fetchall()
+        for (data,) in rows:
+            obj = self.codec.loads(data)
+            if predicate(obj):
+                yield obj
+
+    def get(self, endpoint, object_id) -> dict | None:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT data FROM objects WHERE endpoint = ? AND id = ?",
+                (endpoint, str(object_id)),
+            ).fetchone()
+        return self.codec.loads(row[0]) if row else None
+
+    def insert(self, endpoint, objects) -> list:
+        """
+        Insert objects, giving the ones without an id the next free id. When
+        one object fails none of them is inserted.
+        """
+        with self.lock:
+            max_id = self._get_max_id(endpoint)
+            new_objects = []
+            self.connection.execute("SAVEPOINT insert_objects")
+            try:
+                for obj in objects:
+                    new_object = dict(obj)
+                    if "id" not in new_object:
+                        new_object["id"] = max_id + 1
+                    object_id = new_object["id"]
+                    if isinstance(object_id, int) and not isinstance(object_id, bool):
+                        max_id = max(max_id, object_id)
+                    self.connection.execute(
+                        "INSERT INTO objects (endpoint, id, data) VALUES (?, ?, ?)",
+                        (
+                            endpoint,
+                            str(object_id),
+                            self._dumps(new_object),
+                        ),
+                    )
+                    new_objects.append(new_object)
+            except BaseException:
+                self.connection.execute("ROLLBACK TO insert_objects")
+                self.connection.execute("RELEASE insert_objects")
+                raise
+            self.connection.execute("RELEASE insert_objects")
+            self.max_ids[endpoint] = max_id
+            self._commit()
+            return new_objects
+
+    def update(self, endpoint, object_id, values) -> dict | None:
+        with self.lock:
+            row = self.get(endpoint, object_id)
+            if row is None:
+                return None
+            row.update(values)
+            self.connection.execute(
+                "UPDATE objects SET id = ?, data = ? WHERE endpoint = ? AND id = ?",
+                (
+                    str(row.get("id")),
+                    self._dumps(row),
+                    endpoint,
+                    str(object_id),
+                ),
+            )
+            self._commit()
+            return row
+
+    def delete(self, endpoint, object_id) -> dict | None:
+        with self.lock:
+            row = self.get(endpoint, object_id)
+            if row is None:
+                return None
+            self.connection.execute(
+                "DELETE FROM objects WHERE endpoint = ? AND id = ?",
+                (endpoint, str(object_id)),
+            )
+            self._commit()
+            return row
@@ -0,0 +1,95 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.exceptions import RequestException
+
+logger = logging.getLogger("logger")
+
+
+def _is_client_error(error) -> bool:
+    response = getattr(error, "response", None)
+    return response is not None and 400 <= response.status_code < 500
+
+
+class PatchBuffer(object):
+    """
+    Write-behind buffer which merges successive PATCHes of the same
+    (endpoint, id) into one request. Pending patches are sent concurrently on
+    flush() or as soon as `max_pending` objects are waiting.
+
+    Failed patches stay pending for the next flush, up to `max_attempts`
+    sends. Patches rejected with a 4xx response are dropped right away.
+    """
+
+    def __init__(self, max_pending=100, workers=4, max_attempts=3) -> None:
+        self.max_pending = max_pending
+        self.workers = workers
+        self.max_attempts = max_attempts
+        # (endpoint, id) -> (api, object id, data, failed sends)
+        self.pending = {}
+        self.stats = {"queued": 0, "sent": 0, "dropped": 0}
+        self.lock = threading.Lock()
+
+    def add(self, api, object_id, data) -> None:
+        with self.lock:
+            key = (api.endpoint, str(object_id))
+            if key in self.pending:
+                self.pending[key][2].update(data)
+            else:
+                self.pending[key] = (api, object_id, dict(data), 0)
+            self.stats["queued"] += 1
+            full = len(self.pending) >= self.max_pending
+        if full:
+            # the caller queued an unrelated patch, failures are only logged
+            try:
+                self.flush()
+            except RequestException as error:
+                logger.error(f"Flushing buffered patches failed: {error}")
+
+    def flush(self) -> list:
+        """
+        Send all pending patches and return the patched objects. Raises
+        RequestException listing the failed patches, the ones which can be
+        retried stay pending for the next flush.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return []
+
+        patched, failed = [], []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                (key, executor.submit(api.patch, object_id, data))
+                for key, (api, object_id, data, _) in pending.items()
+            ]
+            for key, future in futures:
+                try:
+                    patched.append(future.result())
+                except Exception as error:
+                    logger.error(f"Buffered patch of {key[0]} {key[1]} failed")
+                    failed.append((key, error))
+
+        with self.lock:
+            self.stats["sent"] += len(patched)
+            for key, error in failed:
+                api, object_id, data, attempts = pending[key]
+                attempts += 1
+                if _is_client_error(error) or attempts >= self.max_attempts:
+                    logger.error(
+                        f"Dropping buffered patch of {key[0]} {key[1]} after {attempts} attempts"
+                    )
+                    self.stats["dropped"] += 1
+                    continue
+                if key in self.pending:
+                    # patches queued during the flush are newer
+                    data.update(self.pending[key][2])
+                self.pending[key] = (api, object_id, data, attempts)
+
+        if failed:
+            errors = "; ".join(f"{key[0]} {key[1]}: {error}" for key, error in failed)
+            raise RequestException(
+                f"{len(failed)} of {len(pending)} buffered patches failed: {errors}"
+            )
+        return patched
@@ -2,7 +2,7 @@ from parladata_base_api.storages.utils import ParladataObject, Storage
 
 
 class AgendaItem(ParladataObject):
-    key = ["name", "session"]
+    keys = ["name", "session"]
 
     def __init__(self, name, id, datetime, session, is_new) -> None:
         self.id = id
@@ -16,16 +16,20 @@ class AgendaItem(ParladataObject):
 
 
 class AgendaItemStorage(Storage):
+    fields = ["id", "name", "datetime"]
+
     def __init__(self, core_storage, session) -> None:
         super().__init__(core_storage)
         self.agenda_items = {}
         self.session = session
+        self.loaded = False
 
     def load_data(self) -> None:
-        for agenda_item in self.parladata_api.agenda_items.get_all(
-            session=self.session.id
+        for agenda_item in self.parladata_api.agenda_items.iter_all(
+            session=self.session.id, fields=self.fields
         ):
             self.store_object(agenda_item, is_new=False)
+        self.loaded = True
 
     def store_object(self, agenda_item, is_new) -> AgendaItem:
         temp_agenda_item = AgendaItem(
@@ -39,7 +43,7 @@ class AgendaItemStorage(Storage):
         return temp_agenda_item
 
     def get_or_add_object(self, data) -> AgendaItem:
-        if not self.agenda_items:
+        if not self.loaded:
             self.load_data()
 
         key = AgendaItem.get_key_from_dict(data)
@@ -11,13 +11,15 @@ class Area(ParladataObject):
 
 
 class AreaStorage(Storage):
+    fields = ["id", "name"]
+
     def __init__(self, core_storage) -> None:
         super().__init__(core_storage)
         self.areas = {}
         self.storage = core_storage
 
     def load_data(self) -> None:
-        for area in self.parladata_api.areas.get_all():
+        for area in self.parladata_api.areas.iter_all(fields=self.fields):
             self.store_area(area, is_new=False)
 
     def store_area(self, area, is_new) -> Area:
@@ -72,6 +72,24 @@ class LegislationConsideration(ParladataObject):
 
 
 class LegislationStorage(Storage):
+    fields = [
+        "id",
+        "epa",
+        "text",
+        "status",
+        "timestamp",
+        "classification",
+        "uid",
+        "mandate",
+    ]
+    consideration_fields = [
+        "id",
+        "legislation",
+        "procedure_phase",
+        "timestamp",
+        "session",
+    ]
+
     def __init__(self, code_storage) -> None:
         super().__init__(code_storage)
 
@@ -93,37 +111,39 @@ class LegislationStorage(Storage):
         logger.debug("Load legislation")
         for (
             legislation_classification
-        ) in self.parladata_api.legislation_classifications.get_all():
+        ) in self.parladata_api.legislation_classifications.iter_all():
             classification = LegislationClassification(
                 id=legislation_classification["id"],
                 name=legislation_classification["name"],
             )
             self.legislation_classifications[classification.get_key()] = classification
 
-        for procedure_phase in self.parladata_api.procedure_phases.get_all():
+        for procedure_phase in self.parladata_api.procedure_phases.iter_all():
             procedure_phase_obj = ProcedurePhase(
                 id=procedure_phase["id"], name=procedure_phase["name"]
             )
             self.procedure_phases[procedure_phase_obj.get_key()] = procedure_phase_obj
             self.procedure_phases_by_id[procedure_phase_obj.id] = procedure_phase_obj
 
-        for legislation_status in self.parladata_api.legislation_statuses.get_all():
+        for legislation_status in self.parladata_api.legislation_statuses.iter_all():
             status = LegislationStatuses(
                 id=legislation_status["id"], name=legislation_status["name"]
             )
             self.statuses_by_id[legislation_status["id"]] = status
             self.legislation_statuses[status.get_key()] = status
 
-        for law in self.parladata_api.legislation.get_all(
-            mandate=self.storage.mandate_id
+        for law in self.parladata_api.legislation.iter_all(
+            mandate=self.storage.mandate_id, fields=self.fields, read_ahead=2
         ):
             self.store_object(law, is_new=False)
 
         # TODO thik about optimizations per session
         for (
             legislation_consideration
-        ) in self.parladata_api.legislation_consideration.get_all(
-            legislation__mandate=self.storage.mandate_id
+        ) in self.parladata_api.legislation_consideration.iter_all(
+            legislation__mandate=self.storage.mandate_id,
+            fields=self.consideration_fields,
+            read_ahead=2,
         ):
             self.store_legislation_consideration(
                 legislation_consideration, is_new=False
@@ -153,8 +173,9 @@ class LegislationStorage(Storage):
     def set_law_status(self, law, status_name) -> Law:
         status = self.legislation_statuses[status_name]
         data = {"status": status.id}
-        patched_law = self.parladata_api.legislation.patch(law.id, data)
-        return self.store_object(patched_law, is_new=False)
+        self.parladata_api.legislation.deferred_patch(law.id, data)
+        law.status = status
+        return law
 
     def set_law_as_enacted(self, epa) -> None:
         in_procedure = self.legislation_statuses["in_procedure"]
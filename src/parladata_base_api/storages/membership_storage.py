@@ -36,16 +36,30 @@ class Membership(ParladataObject):
 
     def set_end_time(self, end_time) -> None:
         self.end_time = end_time
-        self.parladata_api.person_memberships.patch(self.id, {"end_time": end_time})
+        self.parladata_api.person_memberships.deferred_patch(
+            self.id, {"end_time": end_time}
+        )
 
     def __str__(self) -> str:
         return f"<PersonMembership(id={self.id}, member={self.member.name}, organization={self.organization.name if self.organization else None}, on_behalf_of={self.on_behalf_of.name if self.on_behalf_of else None}, role={self.role}, start_time={self.start_time}, end_time={self.end_time}, mandate={self.mandate})>"
 
 
 class MembershipStorage(Storage):
+    fields = [
+        "id",
+        "member",
+        "organization",
+        "on_behalf_of",
+        "role",
+        "start_time",
+        "end_time",
+        "mandate",
+    ]
+
     def __init__(self, core_storage) -> None:
         super().__init__(core_storage)
         self.memberships = defaultdict(list)
+        self.memberships_by_id = {}
 
         self.temporary_data = defaultdict(list)
         self.temporary_roles = defaultdict(list)
@@ -77,6 +91,7 @@ class MembershipStorage(Storage):
             parladata_api=self.parladata_api,
         )
         self.memberships[temp_membership.get_key()].append(temp_membership)
+        self.memberships_by_id[temp_membership.id] = temp_membership
 
         if not membership.get("end_time", None):
             organization.active_memberships_by_member_id[membership["member"]] = (
@@ -97,10 +112,41 @@ class MembershipStorage(Storage):
             organization.memberships.append(temp_membership)
         return temp_membership
 
+    def unstore_object(self, membership: Membership) -> None:
+        """Remove a stored membership from all indexes."""
+        key = membership.get_key()
+        if membership in self.memberships.get(key, []):
+            self.memberships[key].remove(membership)
+            if not self.memberships[key]:
+                del self.memberships[key]
+        if self.memberships_by_id.get(membership.id) is membership:
+            del self.memberships_by_id[membership.id]
+
+        person, organization = membership.member, membership.organization
+        if person:
+            if membership in person.active_memberships:
+                person.active_memberships.remove(membership)
+        if organization:
+            if membership in organization.memberships:
+                organization.memberships.remove(membership)
+            active_memberships = organization.active_memberships_by_member_id
+            if person and active_memberships.get(person.id) is membership:
+                del active_memberships[person.id]
+        if person and organization:
+            on_behalf_id = (
+                membership.on_behalf_of.id if membership.on_behalf_of else None
+            )
+            voters = self.active_voters[person.id][organization.id][on_behalf_id]
+            if membership in voters:
+                voters.remove(membership)
+
     def load_data(self) -> None:
         if not self.memberships:
-            for membership in self.parladata_api.person_memberships.get_all(
-                mandate=self.storage.mandate_id
+            for membership in self.iter_changed(
+                self.parladata_api.person_memberships,
+                mandate=self.storage.mandate_id,
+                fields=self.fields,
+                read_ahead=2,
             ):
                 self.store_object(membership, is_new=False)
             logger.debug(f"loaded was {len(self.memberships)} memberships")
@@ -113,6 +159,24 @@ class MembershipStorage(Storage):
         else:
             self.default_start_time = datetime.now().isoformat()
 
+    def sync_data(self) -> None:
+        """
+        Merge memberships changed since the previous load or sync, replacing
+        stale membership objects. Deleted memberships are not detected.
+        """
+        if not self.memberships:
+            self.load_data()
+            return
+        for membership in self.iter_changed(
+            self.parladata_api.person_memberships,
+            mandate=self.storage.mandate_id,
+            fields=self.fields,
+        ):
+            if membership["id"] in self.memberships_by_id:
+                self.unstore_object(self.memberships_by_id[membership["id"]])
+            self.store_object(membership, is_new=False)
+        logger.debug(f"synced memberships, {len(self.memberships)} loaded")
+
     def get_or_add_object(self, data) -> Membership:
         if not self.memberships:
             self.load_data()
@@ -131,6 +195,14 @@ class MembershipStorage(Storage):
         new_membership = self.store_object(added_membership, is_new=True)
         return new_membership
 
+    def set_memberships(self, memberships) -> list:
+        """Add memberships from any iterable with bulk requests."""
+        return self.set_objects_in_bulk(
+            self.parladata_api.person_memberships,
+            memberships,
+            lambda membership: self.store_object(membership, is_new=True),
+        )
+
     def get_id_if_membership_is_parsed(self, membership) -> Membership | None:
         key = Membership.get_key_from_dict(membership)
         if key in self.memberships.keys():
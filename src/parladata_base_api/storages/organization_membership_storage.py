@@ -32,12 +32,14 @@ class OrganizationMembership(ParladataObject):
 
     def set_end_time(self, end_time) -> dict:
         self.end_time = end_time
-        self.parladata_api.organizations_memberships.patch(
+        self.parladata_api.organizations_memberships.deferred_patch(
             self.id, {"end_time": end_time}
         )
 
 
 class OrganizationMembershipStorage(Storage):
+    fields = ["id", "member", "organization", "start_time", "end_time", "mandate"]
+
     def __init__(self, core_storage) -> None:
         super().__init__(core_storage)
         self.memberships = defaultdict(list)
@@ -66,8 +68,8 @@ class OrganizationMembershipStorage(Storage):
 
     def load_data(self) -> None:
         if not self.memberships:
-            for membership in self.parladata_api.organizations_memberships.get_all(
-                mandate=self.storage.mandate_id
+            for membership in self.parladata_api.organizations_memberships.iter_all(
+                mandate=self.storage.mandate_id, fields=self.fields
             ):
                 self.store_object(membership, is_new=False)
             logger.debug(f"loaded was {len(self.memberships)} memberships")
@@ -93,6 +95,14 @@ class OrganizationMembershipStorage(Storage):
         new_membership = self.store_object(added_membership, is_new=True)
         return new_membership
 
+    def set_memberships(self, memberships) -> list:
+        """Add organization memberships from any iterable with bulk requests."""
+        return self.set_objects_in_bulk(
+            self.parladata_api.organizations_memberships,
+            memberships,
+            lambda membership: self.store_object(membership, is_new=True),
+        )
+
     def check_if_membership_is_parsed(self, membership) -> bool:
         key = OrganizationMembership.get_key_from_dict(membership)
         return key in self.memberships.keys()
@@ -1,4 +1,8 @@
-from parladata_base_api.storages.utils import ParladataObject, Storage
+from parladata_base_api.storages.utils import (
+    ParladataObject,
+    ParserNamesDict,
+    Storage,
+)
 
 
 class Organization(ParladataObject):
@@ -27,15 +31,19 @@ class Organization(ParladataObject):
 
 
 class OrganizationStorage(Storage):
+    fields = ["id", "name", "parser_names", "gov_id", "classification"]
+
     def __init__(self, core_storage) -> None:
         super().__init__(core_storage)
-        self.organizations = {}
+        self.organizations = ParserNamesDict()
         self.organizations_by_id = {}
         self.organizations_by_gov_id = {}
         self.active_memberships_by_member_id = {}
 
     def load_data(self) -> None:
-        for organization in self.parladata_api.organizations.get_all():
+        for organization in self.parladata_api.organizations.iter_all(
+            fields=self.fields
+        ):
             if not organization["parser_names"]:
                 continue
             self.store_object(organization, is_new=False)
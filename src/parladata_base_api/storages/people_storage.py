@@ -1,13 +1,23 @@
 import re
 
-from parladata_base_api.storages.utils import ParladataObject, Storage
+from parladata_base_api.storages.utils import (
+    ParladataObject,
+    ParserNamesDict,
+    Storage,
+)
 
 
 class Person(ParladataObject):
     keys = ["parser_names"]
 
     def __init__(
-        self, name: str, id: int, parser_names: str, is_new: bool, parladata_api
+        self,
+        name: str,
+        id: int,
+        parser_names: str,
+        is_new: bool,
+        parladata_api,
+        people_storage=None,
     ) -> None:
         self.id = id
         self.name = name
@@ -15,27 +25,35 @@ class Person(ParladataObject):
         self.is_new = is_new
         self.active_memberships = []
         self.parladata_api = parladata_api
+        self.people_storage = people_storage
 
     def save_image(self, image_url: str) -> None:
         self.parladata_api.people.upload_image(self.id, image_url)
 
     def add_parser_name(self, parser_name: str) -> None:
+        old_key = self.get_key()
         data = self.parladata_api.people.add_person_parser_name(self.id, parser_name)
         self.parser_names = data["parser_names"]
+        if self.people_storage is not None:
+            self.people_storage.rekey_person(self, old_key)
 
     def __repr__(self):
         return f"<Person {self.name} [{self.id}]>"
 
 
 class PeopleStorage(Storage):
+    fields = ["id", "name", "parser_names"]
+
     def __init__(self, core_storage) -> None:
         super().__init__(core_storage)
-        self.people = {}
+        self.people = ParserNamesDict()
         self.people_by_id = {}
         self.storage = core_storage
 
     def load_data(self) -> None:
-        for person in self.parladata_api.people.get_all():
+        for person in self.parladata_api.people.iter_all(
+            fields=self.fields, read_ahead=2
+        ):
             self.store_object(person, is_new=False)
 
     def store_object(self, person: dict, is_new: bool) -> Person:
@@ -45,6 +63,7 @@ class PeopleStorage(Storage):
             id=person["id"],
             is_new=is_new,
             parladata_api=self.parladata_api,
+            people_storage=self,
         )
         self.people[temp_person.get_key()] = temp_person
         self.people_by_id[person["id"]] = temp_person
@@ -107,10 +126,18 @@ class PeopleStorage(Storage):
         updated_person = self.parladata_api.people.add_person_parser_name(
             person.id, parser_name
         )
-        new_person = self.store_object(updated_person)
-        del self.people[person.parser_name.lower()]
+        old_key = person.get_key()
+        new_person = self.store_object(updated_person, is_new=False)
+        if old_key != new_person.get_key():
+            del self.people[old_key]
         return new_person
 
+    def rekey_person(self, person: Person, old_key: str) -> None:
+        """Index `person` by its current parser names instead of `old_key`."""
+        if self.people.get(old_key, None) is person:
+            del self.people[old_key]
+        self.people[person.get_key()] = person
+
     def get_person_by_id(self, id: int) -> Person:
         if not self.people:
             self.load_data()
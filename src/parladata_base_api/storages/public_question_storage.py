@@ -24,6 +24,8 @@ class PublicAnswer(ParladataObject):
 
 
 class PublicQuestionStorage(Storage):
+    fields = ["id", "gov_id"]
+
     def __init__(self, core_storage) -> None:
         super().__init__(core_storage)
         self.public_questions = {}
@@ -31,14 +33,14 @@ class PublicQuestionStorage(Storage):
 
     def load_data(self) -> None:
         if not self.public_questions:
-            for public_question in self.parladata_api.public_person_questions.get_all(
-                mandate=self.storage.mandate_id
+            for public_question in self.parladata_api.public_person_questions.iter_all(
+                mandate=self.storage.mandate_id, fields=self.fields
             ):
                 self.store_public_question(public_question, False)
             logger.info(f"laoded was {len(self.public_questions)} public questions")
         if not self.public_answers:
-            for public_answer in self.parladata_api.public_person_answers.get_all(
-                mandate=self.storage.mandate_id
+            for public_answer in self.parladata_api.public_person_answers.iter_all(
+                mandate=self.storage.mandate_id, fields=self.fields
             ):
                 self.store_public_answer(public_answer, False)
             logger.info(f"laoded was {len(self.public_answers)} public answers")
@@ -37,19 +37,39 @@ class Question(ParladataObject):
 
 
 class QuestionStorage(Storage):
+    fields = ["id", "gov_id", "title", "timestamp", "answer_timestamp"]
+
     def __init__(self, core_storage) -> None:
         super().__init__(core_storage)
         self.questions = {}
+        self.questions_by_id = {}
         self.storage = core_storage
 
     def load_data(self) -> None:
         if not self.questions:
-            for question in self.parladata_api.questions.get_all(
-                mandate=self.storage.mandate_id
+            for question in self.iter_changed(
+                self.parladata_api.questions,
+                mandate=self.storage.mandate_id,
+                fields=self.fields,
             ):
                 self.store_object(question, is_new=False)
             logger.info(f"laoded was {len(self.questions)} questions")
 
+    def sync_data(self) -> None:
+        """
+        Merge questions changed since the previous load or sync into the
+        loaded questions. Deleted questions are not detected.
+        """
+        if not self.questions:
+            self.load_data()
+            return
+        for question in self.iter_changed(
+            self.parladata_api.questions,
+            mandate=self.storage.mandate_id,
+            fields=self.fields,
+        ):
+            self.store_object(question, is_new=False)
+
     def store_object(self, question: dict, is_new: bool) -> Question:
         temp_question = Question(
             gov_id=question["gov_id"],
@@ -60,7 +80,12 @@ class QuestionStorage(Storage):
             is_new=is_new,
             parladata_api=self.parladata_api,
         )
+        # drop the stale key if the question was re-keyed
+        old_question = self.questions_by_id.get(temp_question.id, None)
+        if old_question and self.questions.get(old_question.get_key()) is old_question:
+            del self.questions[old_question.get_key()]
         self.questions[temp_question.get_key()] = temp_question
+        self.questions_by_id[temp_question.id] = temp_question
         return temp_question
 
     def get_or_add_object(self, data: dict) -> Question:
@@ -75,6 +100,16 @@ class QuestionStorage(Storage):
             new_question = self.store_object(question, is_new=True)
             return new_question
 
+    def add_questions(self, questions) -> list:
+        """Add questions from any iterable with bulk requests."""
+        if not self.questions:
+            self.load_data()
+        return self.set_objects_in_bulk(
+            self.parladata_api.questions,
+            (dict(question, mandate=self.storage.mandate_id) for question in questions),
+            lambda question: self.store_object(question, is_new=True),
+        )
+
     def check_if_question_is_parsed(self, question: dict) -> bool:
         if not self.questions:
             self.load_data()
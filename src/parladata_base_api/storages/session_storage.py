@@ -1,12 +1,42 @@
 import logging
+import threading
+from collections import OrderedDict, defaultdict
 
+from parladata_base_api.api.api import BulkResult
 from parladata_base_api.storages.agenda_item_storage import AgendaItemStorage
-from parladata_base_api.storages.utils import ParladataObject, Storage
+from parladata_base_api.storages.speech_storage import SpeechStorage
+from parladata_base_api.storages.utils import (
+    ParladataObject,
+    ParserNamesDict,
+    Storage,
+    log_failed_chunks,
+)
 from parladata_base_api.storages.vote_storage import VoteStorage
 
 logger = logging.getLogger("logger")
 
 
+class LoadedChildren(object):
+    """
+    Sessions whose child storages were used, least recently used first.
+    Beyond `max_size` sessions the oldest one releases its child storages.
+    """
+
+    def __init__(self, max_size=None) -> None:
+        self.max_size = max_size
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def touch(self, session) -> None:
+        with self.lock:
+            self.sessions[session.id] = session
+            self.sessions.move_to_end(session.id)
+            if self.max_size is None or len(self.sessions) <= self.max_size:
+                return
+            _, evicted = self.sessions.popitem(last=False)
+        evicted.release_children()
+
+
 class Session(ParladataObject):
     keys = ["gov_id"]
 
@@ -23,6 +53,7 @@ class Session(ParladataObject):
         in_review: bool,
         core_storage,
         parladata_api,
+        loaded_children=None,
     ) -> None:
         # session members
         self.id = id
@@ -38,9 +69,47 @@ class Session(ParladataObject):
         self.storage = core_storage
         self.parladata_api = parladata_api
 
-        # session children
-        self.vote_storage = VoteStorage(self.storage, self)
-        self.agenda_items_storage = AgendaItemStorage(self.storage, self)
+        # session children, created on first access
+        self.loaded_children = loaded_children
+        self._vote_storage = None
+        self._agenda_items_storage = None
+        self._speech_storage = None
+
+    def _touch_children(self) -> None:
+        if self.loaded_children is not None:
+            self.loaded_children.touch(self)
+
+    @property
+    def vote_storage(self) -> VoteStorage:
+        vote_storage = self._vote_storage
+        if vote_storage is None:
+            vote_storage = self._vote_storage = VoteStorage(self.storage, self)
+        self._touch_children()
+        return vote_storage
+
+    @property
+    def agenda_items_storage(self) -> AgendaItemStorage:
+        agenda_items_storage = self._agenda_items_storage
+        if agenda_items_storage is None:
+            agenda_items_storage = self._agenda_items_storage = AgendaItemStorage(
+                self.storage, self
+            )
+        self._touch_children()
+        return agenda_items_storage
+
+    @property
+    def speech_storage(self) -> SpeechStorage:
+        speech_storage = self._speech_storage
+        if speech_storage is None:
+            speech_storage = self._speech_storage = SpeechStorage(self.storage, self)
+        self._touch_children()
+        return speech_storage
+
+    def release_children(self) -> None:
+        """Drop the child storages, they are loaded again when needed."""
+        self._vote_storage = None
+        self._agenda_items_storage = None
+        self._speech_storage = None
 
     def __str__(self):
         return f"{self.name} [{self.id}]"
@@ -53,40 +122,137 @@ class Session(ParladataObject):
     def unvalidate_speeches(self) -> None:
         self.parladata_api.sessions.unvalidate_speeches(self.id)
 
-    def add_speeches(self, data) -> None:
-        chunks = [data[x : x + 50] for x in range(0, len(data), 50)]
-        logger.debug(f"Adding {len(chunks)} speech chunks")
-        for chunk in chunks:
-            self.parladata_api.speeches.set(chunk)
+    def add_speeches(self, data, chunk_size=50, concurrency=4) -> BulkResult:
+        """
+        Upload speeches from any iterable in concurrent chunks whose size
+        adapts to the upload latency. Failed chunks are logged and returned
+        in the result.
+        """
+        result = self.parladata_api.speeches.bulk_set(
+            data, chunk_size=chunk_size, concurrency=concurrency, adaptive=True
+        )
+        logger.debug(f"Added {len(result.created)} speeches to session {self.id}")
+        log_failed_chunks(
+            self.parladata_api.speeches, result, target=f" of session {self.id}"
+        )
+        return result
+
+    def sync_speeches(self, data, chunk_size=50, concurrency=4) -> dict:
+        """
+        Send only the difference between the stored speeches and the parsed
+        `data`, instead of unvalidating and uploading all of them.
+        """
+        return self.speech_storage.sync_speeches(
+            data, chunk_size=chunk_size, concurrency=concurrency
+        )
 
     def update_start_time(self, timestamp) -> None:
-        self.parladata_api.sessions.patch(
+        self.parladata_api.sessions.deferred_patch(
             self.id, {"start_time": timestamp.isoformat()}
         )
         self.start_time = timestamp.isoformat()
 
     def update_end_time(self, timestamp) -> None:
-        self.parladata_api.sessions.patch(self.id, {"end_time": timestamp.isoformat()})
+        self.parladata_api.sessions.deferred_patch(
+            self.id, {"end_time": timestamp.isoformat()}
+        )
         self.end_time = timestamp.isoformat()
 
     def patch_session(self, data) -> None:
-        self.parladata_api.sessions.patch(self.id, data)
+        self.parladata_api.sessions.deferred_patch(self.id, data)
 
 
 class SessionStorage(Storage):
-    def __init__(self, core_storage) -> None:
+    fields = [
+        "id",
+        "name",
+        "gov_id",
+        "organizations",
+        "start_time",
+        "end_time",
+        "mandate",
+        "in_review",
+    ]
+
+    def __init__(self, core_storage, max_loaded_sessions=None) -> None:
         super().__init__(core_storage)
+        if max_loaded_sessions is not None and max_loaded_sessions < 1:
+            raise ValueError("max_loaded_sessions has to be at least 1")
 
-        self.sessions = {}
+        # sessions with child storages in memory, unlimited by default
+        self.loaded_children = LoadedChildren(max_loaded_sessions)
+        self.sessions = ParserNamesDict()
+        self.sessions_by_id = {}
         self.dz_sessions_by_names = {}
         self.sessions_in_review = []
 
     def load_data(self):
-        for session in self.parladata_api.sessions.get_all(
-            mandate=self.storage.mandate_id
+        for session in self.iter_changed(
+            self.parladata_api.sessions,
+            mandate=self.storage.mandate_id,
+            fields=self.fields,
         ):
             self.store_object(session, is_new=False)
 
+    def sync_data(self) -> None:
+        """
+        Merge sessions changed since the previous load or sync. Known sessions
+        are updated in place so their votes and agenda items stay loaded.
+        Deleted sessions are not detected.
+        """
+        if not self.sessions:
+            self.load_data()
+            return
+        for session in self.iter_changed(
+            self.parladata_api.sessions,
+            mandate=self.storage.mandate_id,
+            fields=self.fields,
+        ):
+            if session["id"] in self.sessions_by_id:
+                self.update_object(self.sessions_by_id[session["id"]], session)
+            else:
+                self.store_object(session, is_new=False)
+
+    def preload_children(self) -> None:
+        """
+        Load motions, votes and agenda items of all sessions of the mandate
+        with three paged queries and hand them to the vote and
+        agenda item storages of every loaded session. With a
+        `max_loaded_sessions` limit only the last sessions stay preloaded.
+        """
+        if not self.sessions:
+            self.load_data()
+        mandate_id = self.storage.mandate_id
+        # one query at a time, every query already pages in parallel
+        motions_by_session = defaultdict(list)
+        for motion in self.parladata_api.motions.iter_all(
+            session__mandate=mandate_id, fields=VoteStorage.motion_fields
+        ):
+            motions_by_session[motion["session"]].append(motion)
+        votes_by_motion_id = {
+            vote["motion"]: vote
+            for vote in self.parladata_api.votes.iter_all(
+                motion__session__mandate=mandate_id, fields=VoteStorage.vote_fields
+            )
+        }
+        agenda_items_by_session = defaultdict(list)
+        for agenda_item in self.parladata_api.agenda_items.iter_all(
+            session__mandate=mandate_id, fields=AgendaItemStorage.fields + ["session"]
+        ):
+            agenda_items_by_session[agenda_item["session"]].append(agenda_item)
+
+        for session in self.sessions_by_id.values():
+            vote_storage = session.vote_storage
+            vote_storage.motions = {}
+            vote_storage.store_loaded(
+                motions_by_session[session.id], votes_by_motion_id
+            )
+            agenda_items_storage = session.agenda_items_storage
+            agenda_items_storage.agenda_items = {}
+            for agenda_item in agenda_items_by_session[session.id]:
+                agenda_items_storage.store_object(agenda_item, is_new=False)
+            agenda_items_storage.loaded = True
+
     def store_object(self, session, is_new) -> Session:
         temp_session = Session(
             name=session["name"],
@@ -100,13 +266,38 @@ class SessionStorage(Storage):
             in_review=session["in_review"],
             core_storage=self.storage,
             parladata_api=self.parladata_api,
+            loaded_children=self.loaded_children,
         )
-        self.sessions[temp_session.get_key()] = temp_session
-        self.dz_sessions_by_names[temp_session.name.lower()] = temp_session
-        if temp_session.in_review:
-            self.sessions_in_review.append(temp_session)
+        self.index_session(temp_session)
         return temp_session
 
+    def index_session(self, session: Session) -> None:
+        self.sessions[session.get_key()] = session
+        self.sessions_by_id[session.id] = session
+        self.dz_sessions_by_names[session.name.lower()] = session
+        if session.in_review:
+            self.sessions_in_review.append(session)
+
+    def unindex_session(self, session: Session) -> None:
+        if self.sessions.get(session.get_key()) is session:
+            del self.sessions[session.get_key()]
+        if self.dz_sessions_by_names.get(session.name.lower()) is session:
+            del self.dz_sessions_by_names[session.name.lower()]
+        if session in self.sessions_in_review:
+            self.sessions_in_review.remove(session)
+
+    def update_object(self, session: Session, data: dict) -> Session:
+        self.unindex_session(session)
+        session.name = data["name"]
+        session.gov_id = data["gov_id"]
+        session.organizations = data["organizations"]
+        session.start_time = data["start_time"]
+        session.end_time = data["end_time"]
+        session.mandate = data["mandate"]
+        session.in_review = data["in_review"]
+        self.index_session(session)
+        return session
+
     def get_or_add_object(self, data: dict) -> Session:
         if not self.sessions:
             self.load_data()
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+from datetime import datetime
+
+from parladata_base_api.storages.utils import (
+    Storage,
+    log_failed_chunks,
+    run_concurrently,
+)
+
+logger = logging.getLogger("logger")
+
+# fields compared to decide whether a parsed speech changed
+HASH_FIELDS = ["speaker", "content", "start_time", "agenda_items"]
+
+
+def _parse_time(value) -> datetime | None:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _normalize_time(value) -> str | None:
+    """
+    Wall clock time in ISO format, without the offset. The API reports times
+    in its own timezone and parsers give naive local times of the same zone.
+    """
+    if not value:
+        return None
+    time = _parse_time(value)
+    if time is None:
+        return str(value)
+    return time.replace(tzinfo=None).isoformat()
+
+
+def _is_past(value, now) -> bool:
+    """Whether the time `value` is before the aware time `now`."""
+    time = _parse_time(value)
+    if time is None:
+        return False
+    if time.tzinfo is None:
+        return time <= now.replace(tzinfo=None)
+    return time <= now
+
+
+class SpeechStorage(Storage):
+    """
+    Valid speeches of a session as `order -> (id, content hash)`, used to
+    send only changed speeches when a session is parsed again.
+    """
+
+    fields = ["id", "order", "valid_to"] + HASH_FIELDS
+
+    def __init__(self, core_storage, session) -> None:
+        super().__init__(core_storage)
+        self.session = session
+        self.speeches = {}
+        self.duplicates = []
+        self.loaded = False
+
+    @staticmethod
+    def content_hash(speech: dict) -> str:
+        """
+        Hash of the HASH_FIELDS of a speech. Values are normalized first, so
+        speeches from the API and from a parser hash equally.
+        """
+        agenda_items = speech.get("agenda_items", None) or []
+        values = [
+            str(speech.get("speaker", None)),
+            (speech.get("content", None) or "").strip(),
+            _normalize_time(speech.get("start_time", None)),
+            sorted(str(agenda_item) for agenda_item in agenda_items),
+        ]
+        data = json.dumps(values, ensure_ascii=False)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def load_data(self) -> None:
+        self.speeches = {}
+        self.duplicates = []
+        now = datetime.now().astimezone()
+        for speech in self.parladata_api.speeches.iter_all(
+            session=self.session.id,
+            valid_on=now.date().isoformat(),
+            fields=self.fields,
+        ):
+            # valid_on keeps speeches invalidated earlier today
+            if speech.get("valid_to", None) and _is_past(speech["valid_to"], now):
+                continue
+            old_speech = self.speeches.get(speech["order"], None)
+            if old_speech and old_speech[0] > speech["id"]:
+                self.duplicates.append(speech["id"])
+                continue
+            if old_speech:
+                self.duplicates.append(old_speech[0])
+            self.store_object(speech)
+        self.loaded = True
+
+    def store_object(self, speech: dict) -> tuple:
+        self.speeches[speech["order"]] = (speech["id"], self.content_hash(speech))
+        return self.speeches[speech["order"]]
+
+    def diff(self, speeches) -> tuple:
+        """
+        Compare parsed speeches with the loaded ones by `order` and return
+        (speeches to insert, (id, speech) pairs to update, ids to invalidate).
+        """
+        if not self.loaded:
+            self.load_data()
+        to_insert, to_update = [], []
+        seen_orders = set()
+        for speech in speeches:
+            seen_orders.add(speech["order"])
+            stored = self.speeches.get(speech["order"], None)
+            if stored is None:
+                to_insert.append(speech)
+            elif stored[1] != self.content_hash(speech):
+                to_update.append((stored[0], speech))
+        to_invalidate = list(self.duplicates)
+        to_invalidate.extend(
+            speech_id
+            for order, (speech_id, _) in self.speeches.items()
+            if order not in seen_orders
+        )
+        return to_insert, to_update, to_invalidate
+
+    def sync_speeches(self, speeches, chunk_size=50, concurrency=4) -> dict:
+        """
+        Make the valid speeches of the session equal to the parsed
+        `speeches`: new ones are added in bulk, changed ones are patched and
+        the ones missing from the transcript get `valid_to`.
+
+        Nothing is raised, failed chunks are returned in `failed` and failed
+        patches as (speech id, error) in `failed_patches`. Failed speeches
+        are sent again by the next sync.
+        """
+        to_insert, to_update, to_invalidate = self.diff(speeches)
+        to_insert = [{"session": self.session.id, **speech} for speech in to_insert]
+        speeches_api = self.parladata_api.speeches
+
+        result = speeches_api.bulk_set(
+            to_insert, chunk_size=chunk_size, concurrency=concurrency, adaptive=True
+        )
+        log_failed_chunks(speeches_api, result, target=f" of session {self.session.id}")
+        for speech in result.created:
+            self.store_object(speech)
+
+        valid_to = datetime.now().isoformat()
+        patches = [(speech_id, speech) for speech_id, speech in to_update]
+        patches.extend(
+            (speech_id, {"valid_to": valid_to}) for speech_id in to_invalidate
+        )
+        failed_patches = [
+            (speech_id, error)
+            for (speech_id, _), error in run_concurrently(
+                speeches_api.patch, patches, concurrency
+            )
+        ]
+        failed_ids = {speech_id for speech_id, _ in failed_patches}
+        for speech_id, error in failed_patches:
+            logger.error(f"Failed to patch speech {speech_id}: {error}")
+
+        updated = [
+            speech_id for speech_id, _ in to_update if speech_id not in failed_ids
+        ]
+        invalidated = [
+            speech_id for speech_id in to_invalidate if speech_id not in failed_ids
+        ]
+        for speech_id, speech in to_update:
+            if speech_id not in failed_ids:
+                self.store_object(dict(speech, id=speech_id))
+        invalidated_ids = set(invalidated)
+        self.speeches = {
+            order: stored
+            for order, stored in self.speeches.items()
+            if stored[0] not in invalidated_ids
+        }
+        self.duplicates = [
+            speech_id for speech_id in self.duplicates if speech_id in failed_ids
+        ]
+        logger.debug(
+            f"Synced speeches of session {self.session.id}: {len(result.created)} added, "
+            f"{len(updated)} updated, {len(invalidated)} invalidated"
+        )
+        return {
+            "inserted": result.created_ids,
+            "updated": updated,
+            "invalidated": invalidated,
+            "failed": result.failed,
+            "failed_patches": failed_patches,
+        }
@@ -26,6 +26,11 @@ class DataStorage(object):
         api_auth_username: str = None,
         api_auth_password: str = None,
         json_data_path: str = None,
+        cache_path: str = None,
+        json_format: str = "json",
+        json_debug: bool = False,
+        gzip_min_size: int = None,
+        max_loaded_sessions: int = None,
     ) -> None:
         self.mandate_start_time = mandate_start_time
         self.mandate_id = mandate_id
@@ -37,12 +42,16 @@ class DataStorage(object):
             api_auth_username,
             api_auth_password,
             json_data_path,
+            cache_path=cache_path,
+            json_format=json_format,
+            json_debug=json_debug,
+            gzip_min_size=gzip_min_size,
         )
 
         logging.info(
             f"Initialize storages for mandate {mandate_id} with start time {mandate_start_time}"
         )
-        self.session_storage = SessionStorage(self)
+        self.session_storage = SessionStorage(self, max_loaded_sessions)
         self.legislation_storage = LegislationStorage(self)
         self.people_storage = PeopleStorage(self)
         self.organization_storage = OrganizationStorage(self)
@@ -1,7 +1,184 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.exceptions import RequestException
+
+logger = logging.getLogger("logger")
+
+
+def log_failed_chunks(api, result, target="") -> None:
+    """Log every chunk of a BulkResult which was not created."""
+    for index, chunk, error in result.failed:
+        logger.error(
+            f"Failed to add chunk {index} ({len(chunk)} objects) to {api.endpoint}{target}: {error}"
+        )
+
+
+def run_concurrently(function, calls, workers) -> list:
+    """
+    Call `function(*args)` for every args tuple of `calls` with up to
+    `workers` calls in flight. Return (args, error) of the calls that failed.
+    """
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = [(args, executor.submit(function, *args)) for args in calls]
+        for args, future in futures:
+            try:
+                future.result()
+            except Exception as error:
+                failed.append((args, error))
+    return failed
+
+
+class ParserNamesDict(dict):
+    """
+    Dict of objects by their `|` joined parser names key, with an inverted
+    index of single parser names. Keys of every name are kept in insertion
+    order, so `find` returns what scanning the keys in order would.
+
+    For genitive matching the stemmed words of every parser name are kept in
+    buckets by word count, word position and stem.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.keys_by_name = {}
+        self.stem_buckets = {}
+        self.key_order = {}
+        self.next_order = 0
+
+    @staticmethod
+    def stems(name) -> tuple:
+        return tuple(word[:-2] for word in name.lower().split(" "))
+
+    @staticmethod
+    def _split(key) -> list:
+        return list(dict.fromkeys(str(key).split("|")))
+
+    def __setitem__(self, key, value) -> None:
+        if key not in self:
+            for name in self._split(key):
+                self.keys_by_name.setdefault(name, []).append(key)
+            for position, name in enumerate(str(key).split("|")):
+                stems = self.stems(name)
+                for word_index, stem in enumerate(stems):
+                    bucket_key = (len(stems), word_index, stem)
+                    bucket = self.stem_buckets.setdefault(bucket_key, [])
+                    bucket.append((key, position, stems))
+            self.key_order[key] = self.next_order
+            self.next_order += 1
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key) -> None:
+        super().__delitem__(key)
+        for name in self._split(key):
+            keys = self.keys_by_name[name]
+            keys.remove(key)
+            if not keys:
+                del self.keys_by_name[name]
+        for name in self._split(key):
+            stems = self.stems(name)
+            for word_index, stem in enumerate(stems):
+                bucket_key = (len(stems), word_index, stem)
+                bucket = self.stem_buckets.get(bucket_key, [])
+                bucket[:] = [entry for entry in bucket if entry[0] != key]
+                if not bucket:
+                    self.stem_buckets.pop(bucket_key, None)
+        del self.key_order[key]
+
+    def pop(self, key, *default):
+        if key not in self:
+            return super().pop(key, *default)
+        value = self[key]
+        del self[key]
+        return value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def popitem(self):
+        key = next(reversed(self))
+        return key, self.pop(key)
+
+    def clear(self) -> None:
+        super().clear()
+        self.keys_by_name = {}
+        self.stem_buckets = {}
+        self.key_order = {}
+
+    def find(self, name) -> object:
+        keys = self.keys_by_name.get(name, None)
+        return self[keys[0]] if keys else None
+
+    def find_genitive(self, name) -> object:
+        """
+        Return the first object with a parser name whose stems are, word by
+        word, contained in the stems of `name`.
+        """
+        name_stems = self.stems(name)
+        count = len(name_stems)
+        # candidates come from the word with the fewest indexed stems in it
+        candidate_buckets = None
+        for word_index, word in enumerate(name_stems):
+            # every stem contained in the word, including the empty one
+            substrings = {
+                word[start:end]
+                for start in range(len(word) + 1)
+                for end in range(start, len(word) + 1)
+            }
+            buckets = [
+                self.stem_buckets[(count, word_index, substring)]
+                for substring in substrings
+                if (count, word_index, substring) in self.stem_buckets
+            ]
+            size = sum(len(bucket) for bucket in buckets)
+            if candidate_buckets is None or size < candidate_buckets[0]:
+                candidate_buckets = (size, buckets)
+
+        best = None
+        for bucket in candidate_buckets[1]:
+            for key, position, stems in bucket:
+                order = (self.key_order[key], position)
+                if best is not None and order >= best[0]:
+                    continue
+                if all(stem in word for stem, word in zip(stems, name_stems)):
+                    best = (order, key)
+        return self[best[1]] if best else None
+
+
 class Storage(object):
+    # API filter used to ask only for objects changed since the last sync
+    modified_since_filter = "updated_at__gte"
+
     def __init__(self, core_storage) -> None:
         self.storage = core_storage
         self.parladata_api = core_storage.parladata_api
+        self.sync_cursors = {}
+
+    def iter_changed(self, api, fields=None, **filters):
+        """
+        Iterate over objects of the endpoint api changed since the previous
+        call and remember the newest `updated_at` as the next cursor. The first
+        call for an endpoint iterates over all objects.
+        """
+        cursor = self.sync_cursors.get(api.endpoint, None)
+        if cursor:
+            filters[self.modified_since_filter] = cursor
+        if fields and "updated_at" not in fields:
+            fields = [*fields, "updated_at"]
+        for obj in api.iter_all(fields=fields, **filters):
+            updated_at = obj.get("updated_at", None)
+            if updated_at and (not cursor or updated_at > cursor):
+                cursor = updated_at
+            yield obj
+        if cursor:
+            self.sync_cursors[api.endpoint] = cursor
 
     def get_or_add_object(self, data) -> object:
         raise NotImplementedError
@@ -12,10 +189,33 @@ class Storage(object):
     def load_data(self) -> None:
         raise NotImplementedError
 
+    def set_objects_in_bulk(self, api, objects, store=None) -> list:
+        """
+        Create objects with one request per chunk and register the created ones
+        with `store`. Raises RequestException when any chunk failed, after the
+        created objects are registered.
+        """
+        result = api.bulk_set(objects)
+        log_failed_chunks(api, result)
+        if store is None:
+            stored = result.created
+        else:
+            stored = [store(obj) for obj in result.created]
+        if result.failed:
+            failed_count = sum(len(chunk) for _, chunk, _ in result.failed)
+            raise RequestException(
+                f"Failed to add {failed_count} objects to {api.endpoint} "
+                f"in {len(result.failed)} chunks: {result.failed[0][2]}"
+            )
+        return stored
+
     def get_object_by_parsername(self, object_type: str, name: str) -> object:
         """ """
         name = name.lower()
-        for parser_names in getattr(self, object_type).keys():
+        objects = getattr(self, object_type)
+        if isinstance(objects, ParserNamesDict):
+            return objects.find(name)
+        for parser_names in objects.keys():
             for parser_name in parser_names.split("|"):
                 if name == parser_name:
                     return getattr(self, object_type)[parser_names]
@@ -24,6 +224,9 @@ class Storage(object):
     def get_object_by_parsername_compare_genitiv(
         self, object_type: str, name: str
     ) -> object:
+        objects = getattr(self, object_type)
+        if isinstance(objects, ParserNamesDict):
+            return objects.find_genitive(name)
         cutted_name = [word[:-2] for word in name.lower().split(" ")]
         for parser_names in getattr(self, object_type).keys():
             for parser_name in parser_names.split("|"):
@@ -1,4 +1,14 @@
-from parladata_base_api.storages.utils import ParladataObject, Storage
+import logging
+from collections import Counter
+
+from parladata_base_api.storages.utils import (
+    ParladataObject,
+    Storage,
+    log_failed_chunks,
+    run_concurrently,
+)
+
+logger = logging.getLogger("logger")
 
 
 class Motion(ParladataObject):
@@ -28,7 +38,7 @@ class Motion(ParladataObject):
         self.parladata_api = parladata_api
 
     def patch(self, data: dict) -> dict:
-        self.parladata_api.motions.patch(self.id, data)
+        self.parladata_api.motions.deferred_patch(self.id, data)
 
 
 class Vote(ParladataObject):
@@ -48,6 +58,11 @@ class Vote(ParladataObject):
         self.name = name
         self.timestamp = timestamp
         self.has_anonymous_ballots = has_anonymous_ballots
+        # personvoter -> (ballot id, option), None until loaded
+        self.ballots = None
+        # ballot id -> option of ballots without a personvoter
+        self.anonymous_ballots = {}
+        self.duplicate_ballots = []
         self.is_new = is_new
         self.storage = core_storage
         self.parladata_api = parladata_api
@@ -56,28 +71,42 @@ class Vote(ParladataObject):
         self.parladata_api.votes.delete_vote_ballots(self.id)
 
     def patch(self, data: dict):
-        self.parladata_api.votes.patch(self.id, data)
+        self.parladata_api.votes.deferred_patch(self.id, data)
 
 
 class VoteStorage(Storage):
+    motion_fields = ["id", "text", "title", "session", "gov_id", "datetime"]
+    vote_fields = ["id", "motion", "name", "timestamp", "has_anonymous_ballots"]
+    ballot_fields = ["id", "vote", "personvoter", "option"]
+
     def __init__(self, core_storage, session) -> None:
         super().__init__(core_storage)
         self.motions = {}
         self.anonymous_motions = None
+        self.loaded = False
 
         self.session = session
 
     def load_data(self) -> None:
         votes_by_motion_id = {
             vote["motion"]: vote
-            for vote in self.parladata_api.votes.get_all(
-                motion__session=self.session.id
+            for vote in self.parladata_api.votes.iter_all(
+                motion__session=self.session.id, fields=self.vote_fields
             )
         }
-        for motion in self.parladata_api.motions.get_all(session=self.session.id):
+        motions = self.parladata_api.motions.iter_all(
+            session=self.session.id, fields=self.motion_fields
+        )
+        self.store_loaded(motions, votes_by_motion_id)
+
+    def store_loaded(self, motions, votes_by_motion_id) -> None:
+        """Store loaded motions with their votes and mark the storage loaded."""
+        for motion in motions:
             temp_motion = self.store_motion(motion, False)
-            vote = votes_by_motion_id[temp_motion.id]
-            self.store_vote(vote, temp_motion, False)
+            vote = votes_by_motion_id.get(temp_motion.id, None)
+            if vote:
+                self.store_vote(vote, temp_motion, False)
+        self.loaded = True
 
     def store_motion(self, data: dict, is_new: bool) -> Motion:
         motion = Motion(
@@ -107,8 +136,188 @@ class VoteStorage(Storage):
         motion.vote = vote
         return vote
 
-    def set_ballots(self, data: dict) -> dict:
-        self.parladata_api.ballots.set(data)
+    def set_ballots(self, data) -> list:
+        """Add a ballot or any iterable of ballots with bulk requests."""
+        if isinstance(data, dict):
+            data = [data]
+        return self.set_objects_in_bulk(self.parladata_api.ballots, data)
+
+    def load_ballots(self, vote: Vote = None) -> None:
+        """
+        Load ballots of `vote`, or of all votes of the session with one
+        paged request when no vote is given.
+        """
+        if vote is not None:
+            votes = {vote.id: vote}
+            ballots = self.parladata_api.ballots.iter_all(
+                vote=vote.id, fields=self.ballot_fields
+            )
+        else:
+            if not self.loaded:
+                self.load_data()
+            votes = {
+                motion.vote.id: motion.vote
+                for motion in self.motions.values()
+                if motion.vote
+            }
+            ballots = self.parladata_api.ballots.iter_all(
+                vote__motion__session=self.session.id, fields=self.ballot_fields
+            )
+        for loaded_vote in votes.values():
+            loaded_vote.ballots = {}
+            loaded_vote.anonymous_ballots = {}
+            loaded_vote.duplicate_ballots = []
+        for ballot in ballots:
+            ballot_vote = votes.get(ballot["vote"], None)
+            if ballot_vote is None:
+                continue
+            if ballot["personvoter"] is None:
+                ballot_vote.anonymous_ballots[ballot["id"]] = ballot["option"]
+                continue
+            old_ballot = ballot_vote.ballots.get(ballot["personvoter"], None)
+            if old_ballot:
+                ballot_vote.duplicate_ballots.append(old_ballot[0])
+            ballot_vote.ballots[ballot["personvoter"]] = (
+                ballot["id"],
+                ballot["option"],
+            )
+
+    def diff_ballots(self, vote: Vote, ballots) -> tuple:
+        """
+        Compare parsed ballots with the loaded ones and return (ballots to
+        create, (id, ballot) pairs to update, ids to delete). Ballots are
+        matched by personvoter, anonymous ballots by their count per option.
+        """
+        if vote.ballots is None:
+            self.load_ballots(vote)
+        to_create, to_update = [], []
+        personvoters = set()
+        anonymous_options = []
+        for ballot in ballots:
+            personvoter = ballot["personvoter"]
+            if personvoter is None:
+                anonymous_options.append(ballot["option"])
+                continue
+            if personvoter in personvoters:
+                raise ValueError(
+                    f"Personvoter {personvoter} has more than one ballot in vote {vote.id}"
+                )
+            personvoters.add(personvoter)
+            stored = vote.ballots.get(personvoter, None)
+            if stored is None:
+                to_create.append(ballot)
+            elif stored[1] != ballot["option"]:
+                to_update.append((stored[0], ballot))
+        to_delete = list(vote.duplicate_ballots)
+        to_delete.extend(
+            ballot_id
+            for personvoter, (ballot_id, _) in vote.ballots.items()
+            if personvoter not in personvoters
+        )
+
+        # surplus anonymous ballots of an option are changed to a missing
+        # option, the rest is created or deleted
+        surplus = []
+        missing = Counter(anonymous_options)
+        for ballot_id, option in vote.anonymous_ballots.items():
+            if missing[option] > 0:
+                missing[option] -= 1
+            else:
+                surplus.append(ballot_id)
+        missing_options = list(missing.elements())
+        for ballot_id, option in zip(surplus, missing_options):
+            to_update.append((ballot_id, {"personvoter": None, "option": option}))
+        to_delete.extend(surplus[len(missing_options) :])
+        to_create.extend(
+            {"personvoter": None, "option": option}
+            for option in missing_options[len(surplus) :]
+        )
+        return to_create, to_update, to_delete
+
+    @staticmethod
+    def _store_ballot(vote: Vote, ballot_id, personvoter, option) -> None:
+        if personvoter is None:
+            vote.anonymous_ballots[ballot_id] = option
+        else:
+            vote.ballots[personvoter] = (ballot_id, option)
+
+    def sync_ballots(self, vote: Vote, ballots, concurrency=4) -> dict:
+        """
+        Make the ballots of `vote` equal to the parsed `ballots`, sending only
+        created, changed and deleted ballots.
+
+        Nothing is raised, failed chunks are returned in `failed` and failed
+        patches and deletes as (ballot id, error) pairs. They are sent again
+        by the next sync.
+        """
+        to_create, to_update, to_delete = self.diff_ballots(vote, ballots)
+        to_create = [{"vote": vote.id, **ballot} for ballot in to_create]
+        ballots_api = self.parladata_api.ballots
+
+        result = ballots_api.bulk_set(to_create, concurrency=concurrency)
+        log_failed_chunks(ballots_api, result, target=f" of vote {vote.id}")
+        for ballot in result.created:
+            self._store_ballot(
+                vote, ballot["id"], ballot["personvoter"], ballot["option"]
+            )
+
+        failed_patches = [
+            (ballot_id, error)
+            for (ballot_id, _), error in run_concurrently(
+                ballots_api.patch,
+                [
+                    (ballot_id, {"option": ballot["option"]})
+                    for ballot_id, ballot in to_update
+                ],
+                concurrency,
+            )
+        ]
+        failed_deletes = [
+            (ballot_id, error)
+            for (ballot_id,), error in run_concurrently(
+                ballots_api.delete,
+                [(ballot_id,) for ballot_id in to_delete],
+                concurrency,
+            )
+        ]
+        for ballot_id, error in failed_patches + failed_deletes:
+            logger.error(
+                f"Failed to sync ballot {ballot_id} of vote {vote.id}: {error}"
+            )
+
+        failed_ids = {ballot_id for ballot_id, _ in failed_patches}
+        updated = [
+            ballot_id for ballot_id, _ in to_update if ballot_id not in failed_ids
+        ]
+        for ballot_id, ballot in to_update:
+            if ballot_id not in failed_ids:
+                self._store_ballot(
+                    vote, ballot_id, ballot["personvoter"], ballot["option"]
+                )
+
+        failed_ids = {ballot_id for ballot_id, _ in failed_deletes}
+        deleted = {ballot_id for ballot_id in to_delete if ballot_id not in failed_ids}
+        vote.ballots = {
+            personvoter: stored
+            for personvoter, stored in vote.ballots.items()
+            if stored[0] not in deleted
+        }
+        vote.anonymous_ballots = {
+            ballot_id: option
+            for ballot_id, option in vote.anonymous_ballots.items()
+            if ballot_id not in deleted
+        }
+        vote.duplicate_ballots = [
+            ballot_id for ballot_id in vote.duplicate_ballots if ballot_id in failed_ids
+        ]
+        return {
+            "created": result.created_ids,
+            "updated": updated,
+            "deleted": [ballot_id for ballot_id in to_delete if ballot_id in deleted],
+            "failed": result.failed,
+            "failed_patches": failed_patches,
+            "failed_deletes": failed_deletes,
+        }
 
     def set_motion(self, data: dict) -> Motion:
         added_motion = self.parladata_api.motions.set(data)
@@ -119,7 +328,7 @@ class VoteStorage(Storage):
         return self.store_vote(added_vote, motion, True)
 
     def get_or_add_object(self, data: dict) -> Motion:
-        if not self.motions:
+        if not self.loaded:
             self.load_data()
         if self.check_if_motion_is_parsed(data):
             key = Motion.get_key_from_dict(data)
@@ -134,7 +343,7 @@ class VoteStorage(Storage):
             return motion
 
     def check_if_motion_is_parsed(self, motion: dict) -> bool:
-        if not self.motions:
+        if not self.loaded:
             self.load_data()
         key = Motion.get_key_from_dict(motion)
         return self.motions.get(key, None)
@@ -0,0 +1,346 @@
+import gzip
+import json
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from requests.models import Response
+
+from parladata_base_api.api.api import AdaptiveChunkSize, _read_ahead
+from parladata_base_api.api.cache import ResponseCache
+from parladata_base_api.api.endpoints import ParladataApi, PeopleApi
+from parladata_base_api.api.metrics import RequestMetrics
+from parladata_base_api.storages.utils import Storage
+
+BASE_URL = "http://parladata.test/v3"
+
+
+def _decode_gzip_body(data):
+    return json.loads(gzip.decompress(data))
+
+
+class FakeSession(object):
+    """Minimal stand-in for requests.Session serving a paged endpoint."""
+
+    def __init__(self, objects, max_page_size=None, etag=None):
+        self.objects = objects
+        self.max_page_size = max_page_size
+        self.etag = etag
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def _response(self, status_code, payload):
+        response = Response()
+        response.status_code = status_code
+        response._content = json.dumps(payload).encode("utf-8")
+        if self.etag:
+            response.headers["ETag"] = self.etag
+        return response
+
+    def get(self, url, timeout=None, **kwargs):
+        with self.lock:
+            self.requests.append(("get", url, kwargs))
+        headers = kwargs.get("headers") or {}
+        if self.etag and headers.get("If-None-Match") == self.etag:
+            response = Response()
+            response.status_code = 304
+            response._content = b""
+            return response
+        query = parse_qs(urlparse(url).query)
+        limit = int(query.get("limit", ["300"])[0])
+        if self.max_page_size:
+            limit = min(limit, self.max_page_size)
+        offset = int(query.get("offset", ["0"])[0])
+        results = self.objects[offset : offset + limit]
+        next_url = None
+        if offset + limit < len(self.objects):
+            next_url = f"{BASE_URL}/people/?limit={limit}&offset={offset + limit}"
+        return self._response(
+            200,
+            {
+                "count": len(self.objects),
+                "next": next_url,
+                "previous": None,
+                "results": results,
+            },
+        )
+
+    def post(self, url, timeout=None, json=None, **kwargs):
+        if json is None and "data" in kwargs:
+            json = _decode_gzip_body(kwargs["data"])
+        with self.lock:
+            self.requests.append(("post", url, kwargs))
+            items = json if isinstance(json, list) else [json]
+            if any(item.get("fail") for item in items):
+                return self._response(400, {"detail": "invalid"})
+            created = []
+            for item in items:
+                created.append(dict(item, id=len(self.objects) + 1))
+                self.objects.append(created[-1])
+        return self._response(201, created if isinstance(json, list) else created[0])
+
+
+class ApiPagerTest(unittest.TestCase):
+    def setUp(self):
+        self.people = [{"id": i, "name": f"Person {i}"} for i in range(1, 24)]
+
+    def test_sequential_pager_follows_next_links(self):
+        session = FakeSession(self.people)
+        api = PeopleApi(session, BASE_URL, page_workers=1)
+
+        self.assertEqual(api.get_all(limit=5), self.people)
+        self.assertEqual(len(session.requests), 5)
+
+    def test_parallel_pager_returns_pages_in_order(self):
+        session = FakeSession(self.people)
+        api = PeopleApi(session, BASE_URL, page_workers=3)
+
+        self.assertEqual(api.get_all(limit=5), self.people)
+        self.assertEqual(len(session.requests), 5)
+
+        offsets = sorted(
+            parse_qs(urlparse(url).query).get("offset", ["0"])[0]
+            for _, url, _ in session.requests
+        )
+        self.assertEqual(offsets, ["0", "10", "15", "20", "5"])
+
+    def test_parallel_pager_uses_server_page_size(self):
+        session = FakeSession(self.people, max_page_size=4)
+        api = PeopleApi(session, BASE_URL, page_workers=4)
+
+        self.assertEqual(api.get_all(limit=10), self.people)
+        self.assertEqual(len(session.requests), 6)
+
+    def test_fields_are_requested_from_server(self):
+        session = FakeSession(self.people)
+        api = PeopleApi(session, BASE_URL, page_workers=1)
+
+        api.get_all(limit=50, fields=["id", "name"])
+        query = parse_qs(urlparse(session.requests[0][1]).query)
+        self.assertEqual(query["fields"], ["id,name"])
+
+    def test_aware_sync_cursor_is_quoted(self):
+        people = [
+            dict(person, updated_at="2024-01-05T10:00:00.123+02:00")
+            for person in self.people
+        ]
+        session = FakeSession(people)
+        api = PeopleApi(session, BASE_URL, page_workers=1)
+        storage = Storage(SimpleNamespace(parladata_api=api))
+
+        list(storage.iter_changed(api))
+        list(storage.iter_changed(api))
+
+        query = parse_qs(urlparse(session.requests[-1][1]).query)
+        self.assertEqual(query["updated_at__gte"], ["2024-01-05T10:00:00.123+02:00"])
+
+    def test_iter_all_is_lazy(self):
+        session = FakeSession(self.people)
+        api = PeopleApi(session, BASE_URL, page_workers=1)
+
+        people = api.iter_all(limit=5)
+        self.assertEqual(next(people), self.people[0])
+        self.assertEqual(len(session.requests), 1)
+        self.assertEqual(list(people), self.people[1:])
+
+    def test_read_ahead_returns_all_objects(self):
+        session = FakeSession(self.people)
+        api = PeopleApi(session, BASE_URL, page_workers=1)
+
+        self.assertEqual(list(api.iter_all(limit=5, read_ahead=2)), self.people)
+        self.assertEqual(len(session.requests), 5)
+
+    def test_read_ahead_propagates_errors(self):
+        def pages():
+            yield [1]
+            raise ValueError("broken page")
+
+        read_ahead_pages = _read_ahead(pages(), 1)
+        self.assertEqual(next(read_ahead_pages), [1])
+        with self.assertRaises(ValueError):
+            next(read_ahead_pages)
+
+
+class BulkSetTest(unittest.TestCase):
+    def test_bulk_set_returns_created_objects_in_order(self):
+        session = FakeSession([])
+        api = PeopleApi(session, BASE_URL)
+
+        result = api.bulk_set(
+            ({"name": f"Person {i}"} for i in range(7)), chunk_size=3, concurrency=2
+        )
+
+        self.assertTrue(result.ok)
+        self.assertEqual(
+            [person["name"] for person in result.created],
+            [f"Person {i}" for i in range(7)],
+        )
+        self.assertEqual(len(session.requests), 3)
+
+    def test_add_person_parser_name_posts_to_person(self):
+        session = FakeSession([])
+        api = PeopleApi(session, BASE_URL)
+
+        created = api.add_person_parser_name(5, "ana novak")
+
+        self.assertEqual(
+            session.requests[0][1], f"{BASE_URL}/people/5/add_parser_name/"
+        )
+        self.assertEqual(created["parser_name"], "ana novak")
+
+    def test_bulk_set_reports_failed_chunks(self):
+        session = FakeSession([])
+        api = PeopleApi(session, BASE_URL)
+        people = [{"name": "Ana"}, {"name": "Bine", "fail": True}, {"name": "Cene"}]
+
+        result = api.bulk_set(people, chunk_size=1, concurrency=3)
+
+        self.assertEqual([person["name"] for person in result.created], ["Ana", "Cene"])
+        self.assertEqual(len(result.failed), 1)
+        index, chunk, _ = result.failed[0]
+        self.assertEqual((index, chunk), (1, [people[1]]))
+
+    def test_adaptive_bulk_set_consumes_generator(self):
+        session = FakeSession([])
+        api = PeopleApi(session, BASE_URL)
+
+        result = api.bulk_set(
+            ({"name": f"Person {i}"} for i in range(100)),
+            chunk_size=4,
+            concurrency=3,
+            adaptive=True,
+        )
+
+        self.assertEqual(result.created_ids, list(range(1, 101)))
+        # fast chunks let the chunk size grow
+        self.assertLess(len(session.requests), 25)
+
+    def test_adaptive_chunk_size_follows_latency_and_bytes(self):
+        chunker = AdaptiveChunkSize(40, target_time=1.0, max_bytes=10000)
+
+        chunker.update(40, 2.0, 4000)
+        self.assertEqual(chunker.size, 20)
+        chunker.update(20, 0.1, 2000)
+        self.assertEqual(chunker.size, 25)
+        chunker.update(25, 0.1, 25000)
+        self.assertEqual(chunker.size, 10)
+
+    def test_large_bodies_are_sent_gzip_compressed(self):
+        session = FakeSession([])
+        api = PeopleApi(session, BASE_URL, gzip_min_size=500)
+        people = [{"name": f"Person {i}", "text": "Govor " * 50} for i in range(6)]
+
+        result = api.bulk_set(people, chunk_size=3, concurrency=1)
+        api.set({"name": "Ana"})
+
+        self.assertEqual(len(result.created), 6)
+        kwargs = session.requests[0][2]
+        self.assertEqual(kwargs["headers"]["Content-Encoding"], "gzip")
+        self.assertEqual(_decode_gzip_body(kwargs["data"]), people[:3])
+        self.assertNotIn("data", session.requests[-1][2])
+
+
+class RequestMetricsTest(unittest.TestCase):
+    def test_requests_are_recorded_per_endpoint_and_method(self):
+        metrics = RequestMetrics()
+        session = FakeSession([{"id": i} for i in range(1, 11)])
+        api = PeopleApi(session, BASE_URL, page_workers=1, metrics=metrics)
+
+        api.get_all(limit=4)
+        with self.assertRaises(Exception):
+            api.set({"name": "Ana", "fail": True})
+
+        report = metrics.report()
+        people_get = report["endpoints"]["people"]["get"]
+        self.assertEqual(people_get["count"], 3)
+        self.assertEqual(people_get["errors"], 0)
+        self.assertGreater(people_get["bytes"], 0)
+        self.assertEqual(sum(people_get["latency_histogram"].values()), 3)
+        self.assertEqual(report["endpoints"]["people"]["post"]["errors"], 1)
+        self.assertEqual(report["totals"]["count"], 4)
+        self.assertEqual(json.loads(metrics.report(as_json=True)), report)
+
+
+class CassetteTest(unittest.TestCase):
+    def test_recorded_run_is_replayed_without_network(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cassette_path = Path(temp_dir) / "run.jsonl"
+
+            recording_api = ParladataApi(api_url=BASE_URL, page_workers=1)
+            recording_api.use_session(FakeSession([{"id": 1, "name": "Ana"}]))
+            recording_api.record(cassette_path)
+            recorded_people = recording_api.people.get_all()
+            created = recording_api.people.set({"name": "Bine"})
+
+            replay_api = ParladataApi(api_url=BASE_URL, page_workers=1)
+            replay_api.replay(cassette_path, latency_scale=0.5)
+
+            self.assertEqual(replay_api.people.get_all(), recorded_people)
+            self.assertEqual(replay_api.people.set({"name": "Bine"}), created)
+            with self.assertRaises(Exception):
+                replay_api.people.set({"name": "Cene"})
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(
+            Path(self.temp_dir.name) / "cache.sqlite3", ttls={"people": 60}
+        )
+        self.session = FakeSession([{"id": 1, "name": "Ana"}])
+        self.api = PeopleApi(
+            self.session, BASE_URL, page_workers=1, response_cache=self.cache
+        )
+
+    def tearDown(self):
+        self.cache.connection.close()
+        self.temp_dir.cleanup()
+
+    def test_get_is_served_from_cache(self):
+        self.assertEqual(self.api.get_all(), [{"id": 1, "name": "Ana"}])
+        self.assertEqual(self.api.get_all(), [{"id": 1, "name": "Ana"}])
+        self.assertEqual(len(self.session.requests), 1)
+
+    def test_write_invalidates_endpoint(self):
+        self.api.get_all()
+        self.api.set({"name": "Bine"})
+
+        self.assertEqual(len(self.api.get_all()), 2)
+        self.assertEqual(len(self.session.requests), 3)
+
+    def test_endpoint_without_ttl_is_not_cached(self):
+        self.cache.ttls = {}
+        self.api.get_all()
+        self.api.get_all()
+        self.assertEqual(len(self.session.requests), 2)
+
+    def test_least_recently_used_responses_are_evicted(self):
+        self.cache.max_size = 10
+        self.cache.set("a", "people", b"12345678", {})
+        self.cache.set("b", "people", b"12345678", {})
+
+        self.assertIsNone(self.cache.get("a", "people"))
+        self.assertIsNotNone(self.cache.get("b", "people"))
+
+    def test_conditional_get_reuses_body_on_not_modified(self):
+        self.cache.ttls = {}
+        self.session.etag = '"v1"'
+
+        self.assertEqual(self.api.get_all(), [{"id": 1, "name": "Ana"}])
+        self.assertEqual(self.api.get_all(), [{"id": 1, "name": "Ana"}])
+
+        _, _, kwargs = self.session.requests[1]
+        self.assertEqual(kwargs["headers"]["If-None-Match"], '"v1"')
+        self.assertEqual(self.cache.stats["revalidated"], 1)
+        self.assertEqual(self.cache.stats["misses"], 1)
+        self.assertGreater(self.cache.stats["bytes_saved"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
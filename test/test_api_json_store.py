@@ -1,5 +1,7 @@
+import gzip
 import json
 import os
+import sqlite3
 import sys
 import tempfile
 import unittest
@@ -7,7 +9,12 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
-from parladata_base_api.api.endpoints import PeopleApi
+from requests.exceptions import RequestException
+
+from parladata_base_api.api.codec import CODECS
+from parladata_base_api.api.endpoints import ParladataApi, PeopleApi
+from parladata_base_api.api.json_store import JsonLinesStore
+from parladata_base_api.api.sqlite_store import SqliteStore
 
 
 class ApiJsonStoreTest(unittest.TestCase):
@@ -46,6 +53,33 @@ class ApiJsonStoreTest(unittest.TestCase):
         self.assertEqual(len(filtered_people), 1)
         self.assertEqual(filtered_people[0]["id"], 1)
 
+    def test_iter_all_yields_filtered_objects(self):
+        people = self.api.iter_all(name="Bine")
+        self.assertNotIsInstance(people, list)
+        self.assertEqual([person["id"] for person in people], [2])
+
+    def test_fields_trim_objects(self):
+        people = self.api.get_all(fields=["id", "name"], name="Ana")
+        self.assertEqual(people, [{"id": 1, "name": "Ana"}])
+        self.assertIn("parser_names", self.api.get(1))
+
+    def test_returned_objects_are_copies(self):
+        self.api.get(1)["name"] = "Spremenjen"
+        self.api.get_all()[1]["name"] = "Spremenjen"
+        self.api.patch(1, {"organizations": [1]})["organizations"].append(2)
+
+        self.assertEqual(self.api.get(1)["name"], "Ana")
+        self.assertEqual(self.api.get(1)["organizations"], [1])
+        self.assertEqual(self.api.get(2)["name"], "Bine")
+
+    def test_non_integer_ids_are_kept(self):
+        self.api.set({"id": "x1", "name": "Cene"})
+
+        self.assertEqual(self.api.set({"name": "Dora"})["id"], 3)
+        self.assertEqual(self.api.get("x1")["name"], "Cene")
+        reopened = PeopleApi(resquests_session=None, json_data_path=self.json_dir)
+        self.assertEqual(len(reopened.get_all()), 4)
+
     def test_post_patch_delete_flow(self):
         created = self.api.set({"name": "Cene", "parser_names": "cene"})
         self.assertEqual(created["id"], 3)
@@ -63,6 +97,111 @@ class ApiJsonStoreTest(unittest.TestCase):
         self.assertEqual(len(results), 2)
         self.assertFalse(any(item["id"] == 3 for item in results))
 
+    def test_bulk_set_appends_objects_with_new_ids(self):
+        result = self.api.bulk_set(
+            [{"name": "Cene"}, {"name": "Dora"}, {"name": "Eva"}], chunk_size=2
+        )
+
+        self.assertEqual([person["id"] for person in result.created], [3, 4, 5])
+        self.assertEqual(len(self._read_results()), 5)
+
+    def test_write_behind_merges_patches_until_flush(self):
+        with ParladataApi(json_data_path=self.json_dir) as parladata_api:
+            patch_buffer = parladata_api.enable_write_behind(max_pending=10)
+            parladata_api.people.deferred_patch(1, {"name": "Ana Novak"})
+            parladata_api.people.deferred_patch(1, {"parser_names": "ana|ana novak"})
+            parladata_api.people.deferred_patch(2, {"name": "Bine Kos"})
+
+            self.assertEqual(self._read_results()[0]["name"], "Ana")
+
+        results = self._read_results()
+        self.assertEqual(results[0]["name"], "Ana Novak")
+        self.assertEqual(results[0]["parser_names"], "ana|ana novak")
+        self.assertEqual(results[1]["name"], "Bine Kos")
+        self.assertEqual(patch_buffer.stats, {"queued": 3, "sent": 2, "dropped": 0})
+
+    def test_write_behind_flushes_at_size_threshold(self):
+        parladata_api = ParladataApi(json_data_path=self.json_dir)
+        parladata_api.enable_write_behind(max_pending=2)
+
+        parladata_api.people.deferred_patch(1, {"name": "Ana Novak"})
+        self.assertEqual(self._read_results()[0]["name"], "Ana")
+        parladata_api.people.deferred_patch(2, {"name": "Bine Kos"})
+        self.assertEqual(self._read_results()[0]["name"], "Ana Novak")
+
+    def test_failed_buffered_patches_stay_pending(self):
+        parladata_api = ParladataApi(json_data_path=self.json_dir)
+        patch_buffer = parladata_api.enable_write_behind(max_pending=10)
+        parladata_api.people.deferred_patch(1, {"name": "Ana Novak"})
+        parladata_api.people.deferred_patch(99, {"name": "Nihče"})
+        parladata_api.people.deferred_patch(98, {"name": "Nihče"})
+
+        with self.assertRaisesRegex(RequestException, "2 of 3 .*people 99.*people 98"):
+            patch_buffer.flush()
+
+        self.assertEqual(self._read_results()[0]["name"], "Ana Novak")
+        self.assertEqual(
+            list(patch_buffer.pending), [("people", "99"), ("people", "98")]
+        )
+        self.assertEqual(patch_buffer.stats["sent"], 1)
+
+    def test_permanently_failing_patch_is_dropped(self):
+        parladata_api = ParladataApi(json_data_path=self.json_dir)
+        patch_buffer = parladata_api.enable_write_behind(max_pending=2)
+        parladata_api.people.deferred_patch(999, {"name": "Nihče"})
+
+        # every threshold flush retries 999 until it is dropped after 3 sends
+        for index in range(3):
+            parladata_api.people.deferred_patch(1, {"name": f"Ana {index}"})
+            self.assertEqual(self._read_results()[0]["name"], f"Ana {index}")
+        parladata_api.people.deferred_patch(2, {"name": "Bine Kos"})
+        parladata_api.flush()
+
+        self.assertEqual(self._read_results()[1]["name"], "Bine Kos")
+        self.assertEqual(patch_buffer.pending, {})
+        self.assertEqual(patch_buffer.stats["dropped"], 1)
+
+    def test_external_file_changes_are_reloaded(self):
+        self.assertEqual(self.api.get(2)["name"], "Bine")
+
+        payload = {"results": [{"id": 2, "name": "Bine Kos", "parser_names": "bine"}]}
+        with self.people_file.open("w", encoding="utf-8") as file:
+            json.dump(payload, file, ensure_ascii=False, indent=4)
+
+        self.assertEqual(self.api.get(2)["name"], "Bine Kos")
+        self.assertEqual(len(self.api.get_all()), 1)
+        self.assertEqual(self.api.set({"name": "Cene"})["id"], 3)
+
+    def test_json_batch_writes_file_once_on_exit(self):
+        with self.api.json_batch():
+            for index in range(5):
+                self.api.set({"name": f"Person {index}"})
+            self.api.patch(1, {"name": "Ana Novak"})
+
+            self.assertEqual(len(self._read_results()), 2)
+            self.assertEqual(self.api.get(7)["name"], "Person 4")
+
+        results = self._read_results()
+        self.assertEqual(len(results), 7)
+        self.assertEqual(results[0]["name"], "Ana Novak")
+        self.assertNotIn("\n", self.people_file.read_text(encoding="utf-8"))
+        self.assertEqual(os.listdir(self.json_dir), ["people.json"])
+
+    def test_files_are_compact_unless_debugging(self):
+        self.api.set({"name": "Cene"})
+        self.assertNotIn("\n", self.people_file.read_text(encoding="utf-8"))
+
+        for json_codec in CODECS:
+            with self.subTest(json_codec=json_codec):
+                parladata_api = ParladataApi(
+                    json_data_path=self.json_dir, json_codec=json_codec, json_debug=True
+                )
+                parladata_api.people.patch(3, {"name": "Cene Novak"})
+                content = self.people_file.read_text(encoding="utf-8")
+                self.assertIn("\n  ", content)
+                self.assertEqual(self._read_results()[2]["name"], "Cene Novak")
+                self.assertEqual(parladata_api.people.get_all(), self._read_results())
+
     def test_post_creates_new_file_when_missing(self):
         os.remove(self.people_file)
 
@@ -74,5 +213,223 @@ class ApiJsonStoreTest(unittest.TestCase):
         self.assertEqual(results[0]["name"], "Dora")
 
 
+class ApiJsonLinesStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.json_dir = self.temp_dir.name
+        self.people_file = Path(self.json_dir) / "people.jsonl"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _api(self):
+        store = JsonLinesStore(self.json_dir)
+        return PeopleApi(None, json_data_path=self.json_dir, json_store=store)
+
+    def _lines(self):
+        return self.people_file.read_text(encoding="utf-8").splitlines()
+
+    def test_writes_are_appended_and_replayed(self):
+        api = self._api()
+        api.set({"name": "Ana"})
+        api.set({"name": "Bine"})
+        api.patch(1, {"name": "Ana Novak"})
+        api.delete(2)
+
+        self.assertEqual(len(self._lines()), 4)
+        self.assertEqual(self._api().get_all(), [{"name": "Ana Novak", "id": 1}])
+
+    def test_replayed_patches_keep_order(self):
+        api = self._api()
+        api.set([{"name": "Ana"}, {"name": "Bine"}, {"name": "Cene"}])
+        api.patch(1, {"name": "Ana Novak"})
+        api.patch(2, {"id": 20})
+
+        self.assertEqual([person["id"] for person in api.get_all()], [1, 20, 3])
+        reopened = self._api().get_all()
+        self.assertEqual([person["id"] for person in reopened], [1, 20, 3])
+        self.assertEqual(reopened[0]["name"], "Ana Novak")
+
+    def test_incomplete_last_record_is_dropped(self):
+        api = self._api()
+        api.set({"name": "Ana"})
+        with self.people_file.open("a", encoding="utf-8") as file:
+            file.write('{"op":"set","row":{"name":"Bi')
+
+        api = self._api()
+        self.assertEqual([person["name"] for person in api.get_all()], ["Ana"])
+        self.assertEqual(api.set({"name": "Bine"})["id"], 2)
+        self.assertEqual(len(self._lines()), 2)
+
+    def test_compact_rewrites_log_as_snapshot(self):
+        api = self._api()
+        with api.json_batch():
+            for index in range(3):
+                api.set({"name": f"Person {index}"})
+                api.patch(index + 1, {"parser_names": f"person {index}"})
+        api.delete(2)
+
+        api.json_store.compact()
+
+        self.assertEqual(len(self._lines()), 2)
+        self.assertEqual(self._api().get_all(), api.get_all())
+
+
+class GzipJsonStoreTest(unittest.TestCase):
+    def test_endpoints_are_stored_compressed(self):
+        with tempfile.TemporaryDirectory() as json_dir:
+            parladata_api = ParladataApi(json_data_path=json_dir, json_format="json.gz")
+            parladata_api.people.set([{"name": "Ana"}, {"name": "Bine"}])
+            parladata_api.people.patch(2, {"name": "Bine Novak"})
+
+            with gzip.open(Path(json_dir) / "people.json.gz", "rb") as file:
+                payload = json.load(file)
+            self.assertEqual(payload["count"], 2)
+            reopened_api = ParladataApi(json_data_path=json_dir, json_format="json.gz")
+            self.assertEqual(reopened_api.people.get(2)["name"], "Bine Novak")
+
+
+class ApiSqliteStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.json_dir = self.temp_dir.name
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.connection.close()
+        self.temp_dir.cleanup()
+
+    def _api(self):
+        store = SqliteStore(self.json_dir)
+        self.stores.append(store)
+        return PeopleApi(None, json_data_path=self.json_dir, json_store=store)
+
+    def test_post_patch_delete_flow(self):
+        api = self._api()
+        api.set([{"name": "Ana"}, {"name": "Bine"}])
+        api.patch(1, {"name": "Ana Novak"})
+        api.delete(2)
+
+        self.assertEqual(self._api().get_all(), [{"name": "Ana Novak", "id": 1}])
+        self.assertEqual(api.set({"name": "Cene"})["id"], 3)
+
+    def test_failed_insert_is_rolled_back(self):
+        api = self._api()
+        api.set([{"name": "Ana"}, {"name": "Bine"}])
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            api.set([{"name": "Cene"}, {"id": 2, "name": "Bine"}])
+
+        self.assertEqual(api.set({"name": "Dora"})["id"], 3)
+        names = [person["name"] for person in self._api().get_all()]
+        self.assertEqual(names, ["Ana", "Bine", "Dora"])
+
+    def test_non_integer_ids_are_kept(self):
+        api = self._api()
+        api.set({"id": "x1", "name": "Ana"})
+
+        self.assertEqual(api.set({"name": "Bine"})["id"], 1)
+        self.assertEqual(self._api().set({"name": "Cene"})["id"], 2)
+        self.assertEqual(api.get("x1")["name"], "Ana")
+
+    def test_indexed_filters_match_ints_and_strings(self):
+        api = self._api()
+        with api.json_batch():
+            api.set({"name": "Ana", "mandate": 1, "gov_id": "a"})
+            api.set({"name": "Bine", "mandate": "2", "gov_id": "b"})
+            api.set({"name": "Cene", "mandate": 2, "gov_id": "c"})
+
+        self.assertEqual(
+            [person["name"] for person in api.get_all(mandate="2")], ["Bine", "Cene"]
+        )
+        self.assertEqual(
+            [person["name"] for person in api.get_all(mandate=2, name="Cene")],
+            ["Cene"],
+        )
+        self.assertEqual(api.get_all(gov_id="x"), [])
+
+
+class JsonQueryTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _api(self, json_format):
+        api = ParladataApi(
+            json_data_path=Path(self.temp_dir.name) / json_format,
+            json_format=json_format,
+        )
+        api.motions.set(
+            [
+                {"session": 1, "title": "A", "datetime": "2024-01-10"},
+                {"session": 2, "title": "B", "datetime": "2024-02-10"},
+                {"session": 1, "title": "C", "datetime": "2024-03-10"},
+            ]
+        )
+        api.votes.set([{"motion": 1}, {"motion": 2}, {"motion": 3}])
+        return api
+
+    def test_lookups_and_traversal(self):
+        for json_format in ("json", "sqlite"):
+            with self.subTest(json_format=json_format):
+                api = self._api(json_format)
+
+                votes = api.votes.get_all(motion__session=1)
+                self.assertEqual([vote["id"] for vote in votes], [1, 3])
+                votes = api.votes.get_all(
+                    motion__session=1, motion__datetime__gte="2024-02-01"
+                )
+                self.assertEqual([vote["id"] for vote in votes], [3])
+                motions = api.motions.get_all(id__in="1,2", datetime__lte="2024-01-31")
+                self.assertEqual([motion["title"] for motion in motions], ["A"])
+                motions = api.motions.get_all(session__in=[2, 3])
+                self.assertEqual([motion["title"] for motion in motions], ["B"])
+
+                api.motions.patch(2, {"session": 1})
+                votes = api.votes.get_all(motion__session=1)
+                self.assertEqual([vote["id"] for vote in votes], [1, 2, 3])
+
+    def test_related_endpoints_are_queried_once(self):
+        api = self._api("json")
+        api.sessions.set([{"mandate": 1}, {"mandate": 2}])
+        api.ballots.set([{"vote": 1}, {"vote": 2}, {"vote": 3}])
+        store, queried = api.json_store, []
+        store_filter = store.filter
+
+        def counting_filter(endpoint, query):
+            queried.append(endpoint)
+            return store_filter(endpoint, query)
+
+        store.filter = counting_filter
+        ballots = api.ballots.get_all(vote__motion__session__mandate=1)
+
+        self.assertEqual([ballot["vote"] for ballot in ballots], [1, 3])
+        self.assertEqual(sorted(queried), ["ballots", "motions", "sessions", "votes"])
+
+    def test_valid_on_filter(self):
+        for json_format in ("json", "sqlite"):
+            with self.subTest(json_format=json_format):
+                api = self._api(json_format)
+                api.speeches.set(
+                    [
+                        {"order": 1, "valid_from": "2024-01-01", "valid_to": None},
+                        {
+                            "order": 2,
+                            "valid_from": "2024-01-01",
+                            "valid_to": "2024-02-01",
+                        },
+                        {"order": 3, "valid_from": "2024-03-01", "valid_to": None},
+                    ]
+                )
+
+                speeches = api.speeches.get_all(valid_on="2024-02-01")
+                self.assertEqual([speech["order"] for speech in speeches], [1, 2])
+                if json_format == "sqlite":
+                    api.json_store.connection.close()
+
+
 if __name__ == "__main__":
     unittest.main()
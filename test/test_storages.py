@@ -0,0 +1,546 @@
+import sys
+import tempfile
+import unittest
+from json import dumps
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from requests.exceptions import RequestException
+from requests.models import Response
+
+from parladata_base_api.api.api import BulkResult
+from parladata_base_api.api.endpoints import ParladataApi, PeopleApi
+from parladata_base_api.storages.agenda_item_storage import AgendaItemStorage
+from parladata_base_api.storages.people_storage import PeopleStorage
+from parladata_base_api.storages.question_storage import QuestionStorage
+from parladata_base_api.storages.session_storage import SessionStorage
+from parladata_base_api.storages.speech_storage import SpeechStorage
+from parladata_base_api.storages.utils import ParserNamesDict, Storage
+from parladata_base_api.storages.vote_storage import VoteStorage
+
+
+class FakeEndpointApi(object):
+    """Endpoint api returning prepared responses and recording filters."""
+
+    def __init__(self, endpoint, responses):
+        self.endpoint = endpoint
+        self.responses = list(responses)
+        self.calls = []
+
+    def iter_all(self, **filters):
+        self.calls.append(filters)
+        return iter(self.responses.pop(0))
+
+
+class ParserNameSession(object):
+    """requests.Session stand-in answering add_parser_name of person 1."""
+
+    def __init__(self):
+        self.urls = []
+
+    def post(self, url, timeout=None, json=None, **kwargs):
+        self.urls.append(url)
+        response = Response()
+        response.status_code = 200
+        response._content = dumps(
+            {"id": 1, "name": "Ana", "parser_names": f"ana|{json['parser_name']}"}
+        ).encode("utf-8")
+        return response
+
+
+def make_core_storage(**apis):
+    return SimpleNamespace(mandate_id=1, parladata_api=SimpleNamespace(**apis))
+
+
+def make_question(id, gov_id, updated_at, answer_timestamp=None):
+    return {
+        "id": id,
+        "gov_id": gov_id,
+        "answer_timestamp": answer_timestamp,
+        "title": f"Question {id}",
+        "timestamp": "2024-01-01T00:00:00",
+        "updated_at": updated_at,
+    }
+
+
+def make_session(id, name, updated_at, in_review=False):
+    return {
+        "id": id,
+        "name": name,
+        "gov_id": f"session-{id}",
+        "organizations": [1],
+        "start_time": None,
+        "end_time": None,
+        "mandate": 1,
+        "in_review": in_review,
+        "updated_at": updated_at,
+    }
+
+
+class DeltaSyncTest(unittest.TestCase):
+    def test_question_sync_requests_only_changes(self):
+        questions_api = FakeEndpointApi(
+            "questions",
+            [
+                [
+                    make_question(1, "Q1", "2024-01-01T10:00:00"),
+                    make_question(2, "Q2", "2024-01-02T10:00:00"),
+                ],
+                [
+                    make_question(
+                        2, "Q2-new", "2024-01-03T10:00:00", "2024-01-03T00:00:00"
+                    )
+                ],
+            ],
+        )
+        storage = QuestionStorage(make_core_storage(questions=questions_api))
+
+        storage.load_data()
+        storage.sync_data()
+
+        fields = QuestionStorage.fields + ["updated_at"]
+        self.assertEqual(questions_api.calls[0], {"mandate": 1, "fields": fields})
+        self.assertEqual(
+            questions_api.calls[1],
+            {"mandate": 1, "updated_at__gte": "2024-01-02T10:00:00", "fields": fields},
+        )
+        self.assertEqual(sorted(storage.questions.keys()), ["q1", "q2-new"])
+        self.assertEqual(
+            storage.questions["q2-new"].answer_timestamp, "2024-01-03T00:00:00"
+        )
+        self.assertEqual(storage.sync_cursors["questions"], "2024-01-03T10:00:00")
+
+    def test_session_sync_updates_sessions_in_place(self):
+        sessions_api = FakeEndpointApi(
+            "sessions",
+            [
+                [make_session(1, "First", "2024-01-01T10:00:00")],
+                [
+                    make_session(1, "First renamed", "2024-01-05T10:00:00", True),
+                    make_session(2, "Second", "2024-01-05T11:00:00"),
+                ],
+            ],
+        )
+        storage = SessionStorage(make_core_storage(sessions=sessions_api))
+
+        storage.load_data()
+        first_session = storage.sessions_by_id[1]
+        storage.sync_data()
+
+        self.assertIs(storage.sessions_by_id[1], first_session)
+        self.assertEqual(first_session.name, "First renamed")
+        self.assertIs(storage.get_session_by_name("first renamed"), first_session)
+        self.assertIsNone(storage.get_session_by_name("first"))
+        self.assertEqual(storage.sessions_in_review, [first_session])
+        self.assertIn(2, storage.sessions_by_id)
+
+
+class ParserNameIndexTest(unittest.TestCase):
+    def scan(self, objects, name):
+        for parser_names in objects.keys():
+            for parser_name in parser_names.split("|"):
+                if name == parser_name:
+                    return objects[parser_names]
+        return None
+
+    def test_find_matches_scanning_keys_in_order(self):
+        indexed, plain = ParserNamesDict(), {}
+        operations = [
+            ("set", "ana|ana novak", 1),
+            ("set", "bine|ana", 2),
+            ("set", "cene", 3),
+            ("set", "ana|ana novak", 4),
+            ("del", "ana|ana novak", None),
+            ("set", "ana novak|novak", 5),
+            ("pop", "cene", None),
+            ("set", "cene|ana", 6),
+        ]
+        for operation, key, value in operations:
+            for objects in (indexed, plain):
+                if operation == "set":
+                    objects[key] = value
+                elif operation == "del":
+                    del objects[key]
+                else:
+                    objects.pop(key)
+            for name in ("ana", "ana novak", "novak", "bine", "cene", "x"):
+                self.assertEqual(indexed.find(name), self.scan(plain, name))
+
+    def test_genitive_index_matches_scan(self):
+        keys = [
+            "janez novak|novak janez",
+            "ana kovač",
+            "janez novakovič",
+            "marija horvat|m. horvat",
+            "jan nov",
+            "ivo",
+        ]
+        indexed = Storage(SimpleNamespace(parladata_api=None))
+        indexed.people = ParserNamesDict()
+        plain = Storage(SimpleNamespace(parladata_api=None))
+        plain.people = {}
+        for id, key in enumerate(keys):
+            indexed.people[key] = id
+            plain.people[key] = id
+        del indexed.people["ana kovač"], plain.people["ana kovač"]
+        indexed.people["ana kovač"] = plain.people["ana kovač"] = 9
+
+        names = [
+            "Janeza Novaka",
+            "Novaka Janeza",
+            "Janezu Novakoviču",
+            "Ane Kovačeve",
+            "Marije Horvat",
+            "Iva",
+            "Petra Kos",
+            "m. horvata",
+        ]
+        for name in names:
+            self.assertEqual(
+                indexed.get_object_by_parsername_compare_genitiv("people", name),
+                plain.get_object_by_parsername_compare_genitiv("people", name),
+                name,
+            )
+
+    def test_added_parser_name_is_indexed(self):
+        session = ParserNameSession()
+        people_api = PeopleApi(session, "http://parladata.test/v3")
+        storage = PeopleStorage(make_core_storage(people=people_api))
+        person = storage.store_object(
+            {"id": 1, "name": "Ana", "parser_names": "ana"}, is_new=False
+        )
+
+        person.add_parser_name("ana novak")
+
+        self.assertIs(storage.get_object_by_parsername("people", "Ana Novak"), person)
+        self.assertEqual(list(storage.people), ["ana|ana novak"])
+        self.assertEqual(
+            session.urls, ["http://parladata.test/v3/people/1/add_parser_name/"]
+        )
+
+
+class BulkSetTest(unittest.TestCase):
+    def test_failed_ballot_chunk_raises(self):
+        result = BulkResult()
+        result.created.append({"id": 1, "personvoter": 1, "option": "for"})
+        result.failed.append((1, [{"personvoter": 2}], RequestException("400")))
+        ballots_api = SimpleNamespace(
+            endpoint="ballots", bulk_set=lambda objects: result
+        )
+        storage = VoteStorage(
+            make_core_storage(ballots=ballots_api), SimpleNamespace(id=1)
+        )
+
+        with self.assertRaisesRegex(RequestException, "1 objects to ballots"):
+            storage.set_ballots(
+                [{"personvoter": 1, "option": "for"}, {"personvoter": 2}]
+            )
+
+
+class SpeechSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.parladata_api = ParladataApi(json_data_path=self.temp_dir.name)
+        self.core_storage = SimpleNamespace(
+            mandate_id=1, parladata_api=self.parladata_api
+        )
+        self.session = SimpleNamespace(id=7)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _speech(self, order, content):
+        return {"order": order, "speaker": order % 3, "content": content}
+
+    def test_only_changes_are_sent(self):
+        storage = SpeechStorage(self.core_storage, self.session)
+        first = [self._speech(order, f"Govor {order}") for order in range(1, 6)]
+        summary = storage.sync_speeches(first)
+        self.assertEqual(summary["inserted"], [1, 2, 3, 4, 5])
+
+        storage = SpeechStorage(self.core_storage, self.session)
+        corrected = [self._speech(order, f"Govor {order}") for order in (1, 2, 4)]
+        corrected[1]["content"] = "Popravljen govor 2"
+        corrected.append(self._speech(6, "Govor 6"))
+        summary = storage.sync_speeches(corrected)
+
+        self.assertEqual(summary["inserted"], [6])
+        self.assertEqual(summary["updated"], [2])
+        self.assertEqual(sorted(summary["invalidated"]), [3, 5])
+        speeches = self.parladata_api.speeches.get_all(session=7)
+        self.assertEqual(speeches[1]["content"], "Popravljen govor 2")
+        self.assertIsNotNone(speeches[2]["valid_to"])
+        self.assertEqual(storage.diff(corrected), ([], [], []))
+
+    def test_formatting_differences_are_not_changes(self):
+        stored = {
+            "speaker": 3,
+            "content": "Govor",
+            "start_time": "2024-01-01T10:00:00Z",
+            "agenda_items": [2, 1],
+        }
+        parsed = {
+            "speaker": "3",
+            "content": "Govor\n",
+            "start_time": "2024-01-01 10:00:00",
+            "agenda_items": [1, 2],
+        }
+
+        self.assertEqual(
+            SpeechStorage.content_hash(stored), SpeechStorage.content_hash(parsed)
+        )
+        stored["start_time"] = "2024-01-01T10:00:00+02:00"
+        self.assertEqual(
+            SpeechStorage.content_hash(stored), SpeechStorage.content_hash(parsed)
+        )
+
+    def test_aware_valid_to_is_compared_as_time(self):
+        speeches = [
+            dict(self._speech(1, "Govor"), id=1, valid_to=None),
+            dict(self._speech(2, "Govor"), id=2, valid_to="2999-01-01T00:00:00+02:00"),
+            dict(self._speech(3, "Govor"), id=3, valid_to="2000-01-01T00:00:00+02:00"),
+        ]
+        speeches_api = FakeEndpointApi("speeches", [speeches])
+        storage = SpeechStorage(make_core_storage(speeches=speeches_api), self.session)
+
+        storage.load_data()
+
+        self.assertEqual(sorted(storage.speeches), [1, 2])
+        self.assertIn("valid_on", speeches_api.calls[0])
+
+    def test_failed_patches_are_returned(self):
+        storage = SpeechStorage(self.core_storage, self.session)
+        storage.sync_speeches([self._speech(order, "Govor") for order in (1, 2)])
+        self.parladata_api.speeches.delete(1)
+
+        summary = storage.sync_speeches(
+            [self._speech(1, "Popravljen govor"), self._speech(2, "Popravljen govor")]
+        )
+
+        self.assertEqual(summary["updated"], [2])
+        self.assertEqual([speech_id for speech_id, _ in summary["failed_patches"]], [1])
+        self.assertEqual(
+            storage.diff([self._speech(1, "Popravljen govor")])[1][0][0], 1
+        )
+
+
+class BallotSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.parladata_api = ParladataApi(json_data_path=self.temp_dir.name)
+        core_storage = SimpleNamespace(mandate_id=1, parladata_api=self.parladata_api)
+        for session_id in (1, 2):
+            motion = self.parladata_api.motions.set(
+                {
+                    "session": session_id,
+                    "text": f"Motion {session_id}",
+                    "title": f"Motion {session_id}",
+                    "gov_id": None,
+                    "datetime": "2024-01-01T10:00:00",
+                }
+            )
+            vote = self.parladata_api.votes.set(
+                {
+                    "motion": motion["id"],
+                    "name": motion["title"],
+                    "timestamp": motion["datetime"],
+                    "has_anonymous_ballots": False,
+                }
+            )
+            self.parladata_api.ballots.set(
+                [
+                    {"vote": vote["id"], "personvoter": person, "option": "for"}
+                    for person in (1, 2, 3)
+                ]
+            )
+        self.storage = VoteStorage(core_storage, SimpleNamespace(id=2))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_session_ballots_are_diffed_by_personvoter(self):
+        self.storage.load_ballots()
+        vote = self.storage.motions["motion 2_2024-01-01t10:00:00"].vote
+        self.assertEqual(vote.ballots, {1: (4, "for"), 2: (5, "for"), 3: (6, "for")})
+
+        summary = self.storage.sync_ballots(
+            vote,
+            [
+                {"personvoter": 1, "option": "for"},
+                {"personvoter": 2, "option": "against"},
+                {"personvoter": 4, "option": "abstain"},
+            ],
+        )
+
+        self.assertEqual(summary["created"], [7])
+        self.assertEqual(summary["updated"], [5])
+        self.assertEqual(summary["deleted"], [6])
+        ballots = self.parladata_api.ballots.get_all(vote=vote.id)
+        self.assertEqual(
+            [(ballot["personvoter"], ballot["option"]) for ballot in ballots],
+            [(1, "for"), (2, "against"), (4, "abstain")],
+        )
+        self.assertEqual(len(self.parladata_api.ballots.get_all(vote=1)), 3)
+
+    def test_anonymous_ballots_are_diffed_by_option_counts(self):
+        motion = self.parladata_api.motions.set(
+            {
+                "session": 2,
+                "text": "Anonymous",
+                "title": "Anonymous",
+                "gov_id": None,
+                "datetime": "2024-01-01T11:00:00",
+            }
+        )
+        vote = self.parladata_api.votes.set(
+            {
+                "motion": motion["id"],
+                "name": "Anonymous",
+                "timestamp": motion["datetime"],
+                "has_anonymous_ballots": True,
+            }
+        )
+        options = ["for", "for", "against", "abstain"]
+        self.parladata_api.ballots.set(
+            [
+                {"vote": vote["id"], "personvoter": None, "option": option}
+                for option in options
+            ]
+        )
+        self.storage.load_ballots()
+        vote = self.storage.motions["anonymous_2024-01-01t11:00:00"].vote
+
+        summary = self.storage.sync_ballots(
+            vote, [{"personvoter": None, "option": option} for option in options]
+        )
+        self.assertEqual(
+            (summary["created"], summary["updated"], summary["deleted"]), ([], [], [])
+        )
+
+        options = ["against", "against", "against", "abstain", "abstain"]
+        summary = self.storage.sync_ballots(
+            vote, [{"personvoter": None, "option": option} for option in options]
+        )
+        self.assertEqual(summary["updated"], [7, 8])
+        self.assertEqual(summary["created"], [11])
+        ballots = self.parladata_api.ballots.get_all(vote=vote.id)
+        self.assertEqual(
+            sorted(ballot["option"] for ballot in ballots), sorted(options)
+        )
+        self.assertEqual(
+            self.storage.diff_ballots(
+                vote, [{"personvoter": None, "option": option} for option in options]
+            ),
+            ([], [], []),
+        )
+
+    def test_repeated_personvoter_is_rejected(self):
+        self.storage.load_ballots()
+        vote = self.storage.motions["motion 2_2024-01-01t10:00:00"].vote
+
+        with self.assertRaises(ValueError):
+            self.storage.sync_ballots(
+                vote,
+                [
+                    {"personvoter": 1, "option": "for"},
+                    {"personvoter": 1, "option": "against"},
+                ],
+            )
+
+
+class LazyChildrenTest(unittest.TestCase):
+    def test_children_are_created_on_access_and_evicted(self):
+        sessions_api = FakeEndpointApi(
+            "sessions", [[make_session(id, f"S{id}", None) for id in (1, 2, 3)]]
+        )
+        storage = SessionStorage(
+            make_core_storage(sessions=sessions_api), max_loaded_sessions=2
+        )
+        storage.load_data()
+        first, second, third = (storage.sessions_by_id[id] for id in (1, 2, 3))
+        self.assertIsNone(first._vote_storage)
+
+        vote_storage = first.vote_storage
+        self.assertIs(first.vote_storage, vote_storage)
+        second.agenda_items_storage
+        first.speech_storage
+        third.vote_storage
+
+        self.assertIsNone(second._agenda_items_storage)
+        self.assertIs(first.vote_storage, vote_storage)
+        self.assertEqual(list(storage.loaded_children.sessions), [3, 1])
+
+    def test_loaded_sessions_limit_has_to_be_positive(self):
+        with self.assertRaises(ValueError):
+            SessionStorage(make_core_storage(), max_loaded_sessions=0)
+
+    def test_property_returns_storage_it_created(self):
+        sessions_api = FakeEndpointApi("sessions", [[make_session(1, "S1", None)]])
+        storage = SessionStorage(
+            make_core_storage(sessions=sessions_api), max_loaded_sessions=1
+        )
+        storage.load_data()
+        session = storage.sessions_by_id[1]
+        # a session evicted while its storage is created still returns it
+        session._touch_children = session.release_children
+
+        self.assertIsInstance(session.vote_storage, VoteStorage)
+        self.assertIsInstance(session.agenda_items_storage, AgendaItemStorage)
+        self.assertIsInstance(session.speech_storage, SpeechStorage)
+
+
+class PreloadChildrenTest(unittest.TestCase):
+    def test_children_are_partitioned_by_session(self):
+        with tempfile.TemporaryDirectory() as json_dir:
+            parladata_api = ParladataApi(json_data_path=json_dir)
+            parladata_api.sessions.set(
+                [make_session(id, f"Session {id}", None) for id in (1, 2, 3)]
+            )
+            parladata_api.sessions.set(
+                dict(make_session(4, "Other mandate", None), mandate=2)
+            )
+            for session_id in (1, 2, 4):
+                motion = parladata_api.motions.set(
+                    {
+                        "session": session_id,
+                        "text": f"Motion {session_id}",
+                        "title": f"Motion {session_id}",
+                        "gov_id": None,
+                        "datetime": "2024-01-01T10:00:00",
+                    }
+                )
+                parladata_api.votes.set(
+                    {
+                        "motion": motion["id"],
+                        "name": motion["title"],
+                        "timestamp": motion["datetime"],
+                        "has_anonymous_ballots": False,
+                    }
+                )
+                parladata_api.agenda_items.set(
+                    {"session": session_id, "name": "Item", "datetime": None}
+                )
+            storage = SessionStorage(
+                SimpleNamespace(mandate_id=1, parladata_api=parladata_api)
+            )
+
+            storage.preload_children()
+            parladata_api.motions.iter_all = None
+            parladata_api.agenda_items.iter_all = None
+
+            sessions = storage.sessions_by_id
+            self.assertEqual(set(sessions), {1, 2, 3})
+            vote_storage = sessions[2].vote_storage
+            motion = vote_storage.check_if_motion_is_parsed(
+                {"text": "Motion 2", "datetime": "2024-01-01T10:00:00"}
+            )
+            self.assertEqual((motion.id, motion.vote.id), (2, 2))
+            self.assertTrue(sessions[3].vote_storage.loaded)
+            self.assertEqual(sessions[3].vote_storage.motions, {})
+            self.assertEqual(len(sessions[1].agenda_items_storage.agenda_items), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()